@@ -0,0 +1,267 @@
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyvista as pv
+import pyviewfactor as pvf
+
+from caras import caras_de_malla, caras_panel
+from contorno import matriz_contorno
+from geo import factor_de_vista_puntos, matriz_factores_de_vista
+from jerarquico import factor_de_vista_jerarquico
+from montecarlo import factor_vista_esfera_mc
+from orbita import earth_radius, iluminacion_orbita, orbit_time, posiciones_satelite, satellite_orbit_radius
+from planeta import factor_vista_tierra_orbita
+
+# Directorio por defecto de los resultados, fuera del repositorio (como las caches de cache.py)
+DIRECTORIO_RESULTADOS = os.path.expanduser("~/.cache/stc/benchmark")
+
+# Factor de vista entre dos cuadrados unitarios paralelos a distancia 1 (forma cerrada)
+F_PLACAS_PARALELAS = 0.19982
+
+# Cada prueba prepara su escena (sin medir) y devuelve (calcular, unidades): calcular() hace el
+# trabajo medido y devuelve el valor obtenido, y unidades es el número de pares o de rayos que
+# evalúa, para dar el ritmo por segundo.
+
+# Dos paneles de lado 1 enfrentados a distancia 1, como nubes de puntos con normales
+def _placas_paralelas(n):
+    abajo = caras_panel(n, size=1.0)
+    arriba = caras_panel(n, size=1.0)
+    arriba["centroides"][:, 2] += 1.0
+    abajo["normales"] = -abajo["normales"]
+    return abajo, arriba
+
+def _placas_puntos(n=64):
+    abajo, arriba = _placas_paralelas(n)
+    def calcular():
+        return factor_de_vista_puntos(abajo["centroides"], abajo["normales"], arriba["centroides"],
+                                      arriba["normales"], 1.0, 1.0, desc=None)
+    return calcular, len(abajo["areas"]) * len(arriba["areas"])
+
+def _placas_jerarquico(n=128):
+    abajo, arriba = _placas_paralelas(n)
+    def calcular():
+        return factor_de_vista_jerarquico(abajo["centroides"], abajo["normales"], arriba["centroides"],
+                                          arriba["normales"], 1.0, 1.0)
+    return calcular, len(abajo["areas"]) * len(arriba["areas"])
+
+# Esferas de geo.py: la de radio 1 dentro del entorno de radio 10, con el núcleo de geo.py
+# (vía el cálculo jerárquico) y el área real de cada cara. F(esfera -> entorno) = 1 sale del
+# núcleo y no del cierre. Con los puntos de la malla y dA = A/N, como en geo.py, las esferas
+# UV dan en torno a 1.08 porque los puntos se amontonan en los polos.
+def _esferas_concentricas(resolucion=30):
+    esfera = caras_de_malla(pv.Sphere(radius=1, theta_resolution=resolucion, phi_resolution=resolucion))
+    entorno = caras_de_malla(pv.Sphere(radius=10, theta_resolution=resolucion, phi_resolution=resolucion))
+    def calcular():
+        return factor_de_vista_jerarquico(esfera["centroides"], esfera["normales"], entorno["centroides"],
+                                          -entorno["normales"], None, None, areas1=esfera["areas"],
+                                          areas2=entorno["areas"])
+    return calcular, len(esfera["areas"]) * len(entorno["areas"])
+
+# Conjunto completo de geo.py: esfera, dos caras del rectángulo y entorno por cierre
+def _geo_conjunto():
+    superficies = {
+        "esfera": pv.Sphere(radius=1, center=(0, 0, 0)).compute_normals(),
+        "rect_i": pv.Plane(center=(1.5, 0, 0), direction=(1, 0, 0), i_size=2, j_size=2).compute_normals(flip_normals=True),
+        "rect_e": pv.Plane(center=(1.55, 0, 0), direction=(1, 0, 0), i_size=2, j_size=2).compute_normals(),
+        "entorno": pv.Sphere(radius=10, center=(0, 0, 0)).compute_normals(flip_normals=True),
+    }
+    areas = {"esfera": 4 * np.pi, "rect_i": 4.0, "rect_e": 4.0, "entorno": 4 * np.pi * 10**2}
+    puntos = [superficies[nombre].n_points for nombre in ("esfera", "rect_i", "rect_e")]
+    pares = sum(puntos[i] * puntos[j] for i in range(3) for j in range(i, 3))
+    def calcular():
+        F, _ = matriz_factores_de_vista(superficies, areas, entorno="entorno")
+        return F
+    return calcular, pares
+
+# Bucle cara a cara esfera - plano de main.py, por integral de contorno
+def _main_esfera_plano():
+    esfera = pvf.fc_unstruc2poly(pv.Sphere(radius=1.0, center=(0, 0, 0)).cast_to_unstructured_grid())
+    plano = pvf.fc_unstruc2poly(pv.Plane(center=(0, 0, 2.0), direction=(0, 0, 1), i_size=4.0,
+                                         j_size=4.0).cast_to_unstructured_grid())
+    caras_esfera = caras_de_malla(esfera, triangular=False)
+    caras_plano = caras_de_malla(plano, triangular=False)
+    def calcular():
+        return matriz_contorno(caras_esfera["poligonos"], caras_plano["poligonos"], caras_plano["areas"])[1]
+    return calcular, len(caras_esfera["areas"]) * len(caras_plano["areas"])
+
+# Rectángulo - triángulo de tests.py. El triángulo es medio cuadrado unitario paralelo a
+# distancia 1 y por simetría F(triángulo -> rectángulo) = F_PLACAS_PARALELAS.
+def _rectangulo_triangulo():
+    rectangulo = [[1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 0.0]]
+    triangulo = [[0.0, 1.0, 1.0], [1.0, 1.0, 1.0], [1.0, 0.0, 1.0]]
+    return rectangulo, triangulo
+
+def _tests_pvf(repeticiones=200):
+    rectangulo, triangulo = _rectangulo_triangulo()
+    rectangulo, triangulo = pv.Rectangle(rectangulo[:3]), pv.Triangle(triangulo)
+    def calcular():
+        for _ in range(repeticiones):
+            F = pvf.compute_viewfactor(rectangulo, triangulo)
+        return F
+    return calcular, repeticiones
+
+def _tests_contorno(repeticiones=10_000):
+    rectangulo, triangulo = _rectangulo_triangulo()
+    triangulo = np.array(triangulo, dtype=np.float64)
+    receptores = np.broadcast_to(np.array(rectangulo, dtype=np.float64), (repeticiones, 4, 3))
+    area = 0.5 * np.linalg.norm(np.cross(triangulo[1] - triangulo[0], triangulo[2] - triangulo[0]))
+    def calcular():
+        # El mismo par repetido como columna de una matriz de contorno
+        return matriz_contorno(receptores, triangulo[None], np.full(1, area))[0].mean()
+    return calcular, repeticiones
+
+# Factor de vista del panel de view_factor_test.py (n = 10) a la Tierra por Monte Carlo en
+# posiciones de la órbita con un número fijo de rondas (error_objetivo infinito para que no
+# se siga iterando ni se avise de falta de convergencia); el valor es el error máximo frente
+# a la forma cerrada
+def _panel_tierra_mc(n=10, posiciones=20, rondas=8, muestras=64):
+    panel = caras_panel(n)
+    tiempos = np.linspace(0, orbit_time, posiciones, endpoint=False)
+    exacto = factor_vista_tierra_orbita(tiempos, panel) @ panel["areas"] / panel["areas"].sum()
+    def calcular():
+        F = [factor_vista_esfera_mc(panel, -p, earth_radius, muestras_por_ronda=muestras, min_rondas=rondas,
+                                    max_rondas=rondas, error_objetivo=np.inf, semilla=0)[0] for p in posiciones_satelite(tiempos)]
+        return np.abs(np.array(F) - exacto).max()
+    return calcular, posiciones * rondas * muestras * len(panel["areas"])
+
+# Barridos de eclipse de test_rays_from_sat.py (Sol en el infinito) y test_rays_from_sun.py
+# (Sol a distancia finita). El valor es la fracción de caras-paso iluminadas, que con la umbra
+# cilíndrica vale 1 - asen(R/r)/π.
+def _panel_tierra_eclipse(n, pasos=360, posicion_sol=None):
+    panel = caras_panel(n)
+    tiempos = np.linspace(0, orbit_time, pasos, endpoint=False)
+    def calcular():
+        return iluminacion_orbita(tiempos, panel, posicion_sol=posicion_sol, progreso=False).mean()
+    return calcular, pasos * len(panel["areas"])
+
+FRACCION_ILUMINADA = 1 - np.arcsin(earth_radius / satellite_orbit_radius) / np.pi
+
+# Nombre -> (preparación, argumentos, unidad, referencia, tolerancia). La referencia es analítica
+# salvo en las escenas sin forma cerrada (None), cuyo valor se guarda para comparar entre versiones.
+PRUEBAS = {
+    "placas_paralelas_puntos": (_placas_puntos, {}, "pares", F_PLACAS_PARALELAS, 2e-3),
+    "placas_paralelas_jerarquico": (_placas_jerarquico, {}, "pares", F_PLACAS_PARALELAS, 2e-3),
+    "esferas_concentricas": (_esferas_concentricas, {}, "pares", 1.0, 1e-2),
+    "geo_conjunto": (_geo_conjunto, {}, "pares", None, None),
+    "main_esfera_plano": (_main_esfera_plano, {}, "pares", None, None),
+    "tests_rectangulo_triangulo_pvf": (_tests_pvf, {}, "pares", F_PLACAS_PARALELAS, 1e-4),
+    "tests_rectangulo_triangulo_contorno": (_tests_contorno, {}, "pares", F_PLACAS_PARALELAS, 1e-4),
+    "panel_tierra_n10": (_panel_tierra_mc, {"n": 10}, "rayos", 0.0, 5e-3),
+    "panel_tierra_n50": (_panel_tierra_eclipse, {"n": 50}, "rayos", FRACCION_ILUMINADA, 1 / 360),
+    "panel_tierra_n506": (_panel_tierra_eclipse, {"n": 506, "posicion_sol": (1.496e11, 0.0, 0.0)}, "rayos",
+                          FRACCION_ILUMINADA, 1 / 360),
+}
+
+# Memoria residente pico del proceso en MB (ru_maxrss va en kB en Linux y en bytes en macOS)
+def _rss_pico_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == "darwin" else pico / 2**10
+
+# Ejecuta una prueba en el proceso actual: prepara la escena, repite el cálculo y se queda
+# con el menor tiempo de pared
+def ejecutar_prueba(nombre, repeticiones=1):
+    preparar, argumentos, unidad, referencia, tolerancia = PRUEBAS[nombre]
+    inicio = time.perf_counter()
+    calcular, unidades = preparar(**argumentos)
+    preparacion = time.perf_counter() - inicio
+    rss_inicial = _rss_pico_mb()
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        valor = calcular()
+        tiempos.append(time.perf_counter() - inicio)
+    tiempo = min(tiempos)
+
+    valor = np.asarray(valor, dtype=np.float64)
+    resultado = {
+        "nombre": nombre,
+        "preparacion_s": preparacion,
+        "tiempo_s": tiempo,
+        "tiempos_s": tiempos,
+        "unidad": unidad,
+        "unidades": int(unidades),
+        f"{unidad}_por_s": unidades / tiempo,
+        "rss_inicial_mb": rss_inicial,
+        "rss_pico_mb": _rss_pico_mb(),
+        "valor": valor.tolist(),
+        "referencia": referencia,
+        "error": None,
+        "correcto": None,
+    }
+    if referencia is not None:
+        error = float(np.abs(valor - referencia).max())
+        resultado.update(error=error, correcto=error <= tolerancia)
+    return resultado
+
+# Cada prueba corre en un proceso nuevo para que la memoria pico sea solo la suya
+def _ejecutar_aislada(args):
+    return ejecutar_prueba(*args)
+
+# Commit actual del repositorio, si lo hay
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Ejecuta las pruebas pedidas (todas por defecto) y guarda los resultados en JSON junto con
+# el commit y el entorno, para comparar ejecuciones entre versiones con comparar(). Sin ruta,
+# el fichero va a DIRECTORIO_RESULTADOS con la fecha y el commit en el nombre.
+def ejecutar_benchmark(ruta=None, nombres=None, repeticiones=1):
+    nombres = list(nombres or PRUEBAS)
+    contexto = mp.get_context("spawn")
+    resultados = []
+    for nombre in nombres:
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as ejecutor:
+            resultado = ejecutor.submit(_ejecutar_aislada, (nombre, repeticiones)).result()
+        resultados.append(resultado)
+        estado = {True: "ok", False: "FALLO", None: "-"}[resultado["correcto"]]
+        print(f"{nombre:38s} {resultado['tiempo_s']:9.3f} s {resultado[resultado['unidad'] + '_por_s']:10.3g} "
+              f"{resultado['unidad']}/s {resultado['rss_pico_mb']:8.1f} MB  {estado}")
+
+    commit, fecha = _commit(), time.strftime("%Y-%m-%dT%H:%M:%S")
+    informe = {
+        "commit": commit,
+        "fecha": fecha,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "procesadores": os.cpu_count(),
+        "repeticiones": repeticiones,
+        "resultados": resultados,
+    }
+    if ruta is None:
+        os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+        nombre = fecha.replace(":", "") + ("_" + commit[:8] if commit else "") + ".json"
+        ruta = os.path.join(DIRECTORIO_RESULTADOS, nombre)
+    with open(ruta, "w") as fichero:
+        json.dump(informe, fichero, indent=2)
+    print("Resultados guardados en", ruta)
+    return informe
+
+# Cociente de tiempos (nuevo / base) de las pruebas comunes a dos ficheros de resultados
+def comparar(ruta_base, ruta_nueva):
+    with open(ruta_base) as fichero:
+        base = {r["nombre"]: r for r in json.load(fichero)["resultados"]}
+    with open(ruta_nueva) as fichero:
+        nueva = {r["nombre"]: r for r in json.load(fichero)["resultados"]}
+    cocientes = {nombre: nueva[nombre]["tiempo_s"] / base[nombre]["tiempo_s"] for nombre in base if nombre in nueva}
+    for nombre, cociente in cocientes.items():
+        print(f"{nombre:38s} x{cociente:6.2f}  {base[nombre]['rss_pico_mb']:8.1f} -> {nueva[nombre]['rss_pico_mb']:8.1f} MB")
+    return cocientes
+
+if __name__ == "__main__":
+    # python benchmark.py [resultados.json] [prueba ...]
+    argumentos = sys.argv[1:]
+    ruta = argumentos.pop(0) if argumentos and argumentos[0].endswith(".json") else None
+    ejecutar_benchmark(ruta, argumentos or None)
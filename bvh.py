@@ -0,0 +1,143 @@
+import numpy as np
+
+# Jerarquía de volúmenes envolventes (BVH) sobre un array de triángulos (N, 3, 3).
+# Se construye una sola vez y se guarda en arrays planos para recorrerla con NumPy.
+def construir_bvh(triangulos, tam_hoja=8):
+    triangulos = np.asarray(triangulos, dtype=np.float64)
+    n = len(triangulos)
+    centroides = triangulos.mean(axis=1)
+    tri_min = triangulos.min(axis=1)
+    tri_max = triangulos.max(axis=1)
+    orden = np.arange(n)
+
+    nodo_min, nodo_max, izq, der, inicio, cuenta = [], [], [], [], [], []
+
+    # Pila de (inicio, fin, nodo padre, lado) para construir sin recursión
+    pila = [(0, n, -1, 0)]
+    while pila:
+        a, b, padre, lado = pila.pop()
+        idx = orden[a:b]
+        k = len(nodo_min)
+        nodo_min.append(tri_min[idx].min(axis=0))
+        nodo_max.append(tri_max[idx].max(axis=0))
+        izq.append(-1)
+        der.append(-1)
+        inicio.append(a)
+        cuenta.append(b - a)
+        if padre >= 0:
+            (izq if lado == 0 else der)[padre] = k
+
+        c = centroides[idx]
+        extension = c.max(axis=0) - c.min(axis=0)
+        if b - a <= tam_hoja or extension.max() <= 0:
+            continue
+
+        # División por la mediana de los centroides en el eje más largo
+        eje = np.argmax(extension)
+        mitad = (b - a) // 2
+        orden[a:b] = idx[np.argpartition(c[:, eje], mitad)]
+        cuenta[k] = 0
+        pila.append((a + mitad, b, k, 1))
+        pila.append((a, a + mitad, k, 0))
+
+    v0 = triangulos[orden, 0]
+    return {
+        "min": np.array(nodo_min),
+        "max": np.array(nodo_max),
+        "izq": np.array(izq, dtype=np.int64),
+        "der": np.array(der, dtype=np.int64),
+        "inicio": np.array(inicio, dtype=np.int64),
+        "cuenta": np.array(cuenta, dtype=np.int64),
+        "indice": orden,
+        "v0": v0,
+        "e1": triangulos[orden, 1] - v0,
+        "e2": triangulos[orden, 2] - v0,
+    }
+
+# Test de Möller-Trumbore para pares (rayo, triángulo) ya emparejados
+def _interseccion_triangulos(origen, direccion, v0, e1, e2):
+    p = np.cross(direccion, e2)
+    det = np.einsum("ij,ij->i", e1, p)
+    valido = np.abs(det) > 1e-300
+    inv_det = 1.0 / np.where(valido, det, 1.0)
+    s = origen - v0
+    u = np.einsum("ij,ij->i", s, p) * inv_det
+    q = np.cross(s, e1)
+    v = np.einsum("ij,ij->i", direccion, q) * inv_det
+    t = np.einsum("ij,ij->i", e2, q) * inv_det
+    valido &= (u >= 0) & (v >= 0) & (u + v <= 1)
+    return np.where(valido, t, np.inf)
+
+# Recorrido en frente de onda: todos los pares (rayo, nodo) activos se evalúan a la vez
+def _ocluidos_lote(bvh, origenes, direcciones, t_min, t_max, ignorar):
+    n = len(origenes)
+    ocluido = np.zeros(n, dtype=bool)
+    inv = 1.0 / np.where(direcciones == 0, 1e-300, direcciones)
+    caja_min, caja_max = bvh["min"].T, bvh["max"].T
+
+    rayos = np.arange(n)
+    nodos = np.zeros(n, dtype=np.int64)
+    while len(rayos):
+        # Test de las cajas por el método de las placas, eje a eje
+        t_cerca = t_min[rayos]
+        t_lejos = t_max[rayos]
+        for eje in range(3):
+            o = origenes[rayos, eje]
+            iv = inv[rayos, eje]
+            t1 = (caja_min[eje, nodos] - o) * iv
+            t2 = (caja_max[eje, nodos] - o) * iv
+            t_cerca = np.maximum(t_cerca, np.minimum(t1, t2))
+            t_lejos = np.minimum(t_lejos, np.maximum(t1, t2))
+        dentro = t_cerca <= t_lejos
+        rayos, nodos = rayos[dentro], nodos[dentro]
+
+        # Hojas: expandir a pares (rayo, triángulo) y aplicar Möller-Trumbore
+        hoja = bvh["izq"][nodos] < 0
+        r_hoja, n_hoja = rayos[hoja], nodos[hoja]
+        cnt = bvh["cuenta"][n_hoja]
+        if cnt.sum():
+            r_tri = np.repeat(r_hoja, cnt)
+            tri = np.repeat(bvh["inicio"][n_hoja] - np.cumsum(cnt) + cnt, cnt) + np.arange(cnt.sum())
+            t = _interseccion_triangulos(origenes[r_tri], direcciones[r_tri],
+                                         bvh["v0"][tri], bvh["e1"][tri], bvh["e2"][tri])
+            golpe = (t > t_min[r_tri]) & (t < t_max[r_tri])
+            if ignorar is not None:
+                golpe &= ~(ignorar[r_tri] == bvh["indice"][tri][:, None]).any(axis=1)
+            ocluido[r_tri[golpe]] = True
+
+        # Nodos internos: bajar a los dos hijos de los rayos que aún no están ocluidos
+        r_int, n_int = rayos[~hoja], nodos[~hoja]
+        sigue = ~ocluido[r_int]
+        r_int, n_int = r_int[sigue], n_int[sigue]
+        rayos = np.concatenate([r_int, r_int])
+        nodos = np.concatenate([bvh["izq"][n_int], bvh["der"][n_int]])
+    return ocluido
+
+# Indica qué rayos origen + t·direccion chocan con algún triángulo para t en (t_min, t_max).
+# ignorar es un array (R, k) opcional de índices de triángulos que cada rayo no debe ver
+# (p. ej. la cara de la que sale y la cara a la que llega).
+def rayos_ocluidos(bvh, origenes, direcciones, t_min=1e-9, t_max=np.inf, ignorar=None,
+                   tam_lote=65536):
+    origenes = np.asarray(origenes, dtype=np.float64)
+    direcciones = np.asarray(direcciones, dtype=np.float64)
+    n = len(origenes)
+    t_min = np.broadcast_to(np.asarray(t_min, dtype=np.float64), (n,))
+    t_max = np.broadcast_to(np.asarray(t_max, dtype=np.float64), (n,))
+    if ignorar is not None:
+        ignorar = np.asarray(ignorar)
+        if ignorar.ndim == 1:
+            ignorar = ignorar[:, None]
+
+    ocluido = np.zeros(n, dtype=bool)
+    for a in range(0, n, tam_lote):
+        b = min(a + tam_lote, n)
+        ocluido[a:b] = _ocluidos_lote(bvh, origenes[a:b], direcciones[a:b], t_min[a:b], t_max[a:b],
+                                      None if ignorar is None else ignorar[a:b])
+    return ocluido
+
+# Indica qué segmentos inicio -> fin quedan tapados por algún triángulo de la BVH
+def segmentos_ocluidos(bvh, inicios, finales, ignorar=None, eps=1e-6, tam_lote=65536):
+    inicios = np.asarray(inicios, dtype=np.float64)
+    direcciones = np.asarray(finales, dtype=np.float64) - inicios
+    return rayos_ocluidos(bvh, inicios, direcciones, t_min=eps, t_max=1 - eps,
+                          ignorar=ignorar, tam_lote=tam_lote)
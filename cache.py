@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pyvista as pv
+
+from caras import caras_de_malla
+
+# Directorio por defecto de la caché y tamaño máximo en disco (bytes)
+DIRECTORIO_CACHE = os.path.expanduser("~/.cache/stc/factores")
+DIRECTORIO_ESCENAS = os.path.expanduser("~/.cache/stc/escenas")
+TAM_MAX_CACHE = 2 * 1024**3
+
+# Formato del fichero binario de caras: MAGIA, longitud de la cabecera (uint64), cabecera JSON
+# {nombre: [tipo, forma, desplazamiento]} y los arrays seguidos, alineados a ALINEACION bytes
+MAGIA = b"STCCARAS"
+ALINEACION = 64
+
+# Hash del contenido de los arrays de caras y de los ajustes del cálculo. Dos geometrías con
+# los mismos arrays y el mismo solver comparten clave aunque vengan de ejecuciones distintas.
+def clave_geometria(caras, ajustes=None):
+    h = hashlib.sha256()
+    for nombre in sorted(caras):
+        array = np.ascontiguousarray(caras[nombre])
+        h.update(nombre.encode())
+        h.update(array.dtype.str.encode())
+        h.update(str(array.shape).encode())
+        h.update(array.tobytes())
+    h.update(json.dumps(ajustes or {}, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+# Borrar las entradas usadas hace más tiempo hasta que la caché quepa en tam_max
+def _recortar_cache(directorio, tam_max, conservar):
+    entradas = []
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        if nombre.endswith(".npy") and ruta != conservar:
+            info = os.stat(ruta)
+            entradas.append((info.st_mtime, info.st_size, ruta))
+    total = sum(tam for _, tam, _ in entradas)
+    if os.path.exists(conservar):
+        total += os.path.getsize(conservar)
+    for _, tam, ruta in sorted(entradas):
+        if total <= tam_max:
+            break
+        os.remove(ruta)
+        total -= tam
+
+# Matriz de factores de vista guardada en disco por clave de geometría. Si ya existe se abre
+# como memmap de solo lectura (milisegundos); si no, se llama a calcular() sin argumentos,
+# se guarda en formato .npy y se aplica la expulsión LRU por tamaño.
+def matriz_en_cache(calcular, caras, ajustes=None, directorio=DIRECTORIO_CACHE, tam_max=TAM_MAX_CACHE):
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, clave_geometria(caras, ajustes) + ".npy")
+    if os.path.exists(ruta):
+        os.utime(ruta)  # Marca de último uso para la expulsión LRU
+        return np.load(ruta, mmap_mode="r")
+
+    F = np.asarray(calcular())
+    # Escritura atómica para que otro proceso nunca lea un fichero a medias
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "wb") as fichero:
+        np.save(fichero, F)
+    os.replace(temporal, ruta)
+    _recortar_cache(directorio, tam_max, ruta)
+    return np.load(ruta, mmap_mode="r")
+
+# Guardar los arrays de caras (triángulos, normales, áreas, centroides, superficie...) en un
+# único fichero plano. La escritura es atómica, como la de matriz_en_cache.
+def guardar_caras(caras, ruta):
+    arrays = {nombre: np.ascontiguousarray(array) for nombre, array in caras.items()}
+    cabecera, desplazamiento = {}, 0
+    for nombre, array in arrays.items():
+        cabecera[nombre] = [array.dtype.str, list(array.shape), desplazamiento]
+        desplazamiento += -(-array.nbytes // ALINEACION) * ALINEACION
+    texto = json.dumps(cabecera).encode()
+    inicio_datos = -(-(len(MAGIA) + 8 + len(texto)) // ALINEACION) * ALINEACION
+
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "wb") as fichero:
+        fichero.write(MAGIA)
+        fichero.write(np.uint64(len(texto)).tobytes())
+        fichero.write(texto)
+        for nombre, array in arrays.items():
+            fichero.seek(inicio_datos + cabecera[nombre][2])
+            fichero.write(array.tobytes())
+        fichero.truncate(inicio_datos + desplazamiento)
+    os.replace(temporal, ruta)
+
+# Abrir un fichero de guardar_caras sin leerlo: todos los arrays son vistas de solo lectura de
+# un mismo memmap, así que varios procesos comparten las mismas páginas del sistema operativo
+def abrir_caras(ruta):
+    base = np.memmap(ruta, dtype=np.uint8, mode="r")
+    if bytes(base[:len(MAGIA)]) != MAGIA:
+        raise ValueError(f"{ruta} no es un fichero de caras")
+    longitud = int(base[len(MAGIA):len(MAGIA) + 8].view(np.uint64)[0])
+    cabecera = json.loads(bytes(base[len(MAGIA) + 8:len(MAGIA) + 8 + longitud]))
+    inicio_datos = -(-(len(MAGIA) + 8 + longitud) // ALINEACION) * ALINEACION
+    return {nombre: np.ndarray(tuple(forma), dtype=tipo, buffer=base, offset=inicio_datos + desplazamiento)
+            for nombre, (tipo, forma, desplazamiento) in cabecera.items()}
+
+# Caras guardadas en disco según los ajustes con los que se construyen (p. ej. {"panel": 506}).
+# La primera vez se llama a construir() y se compila el fichero; las siguientes solo se abre.
+def caras_en_cache(construir, ajustes, directorio=DIRECTORIO_ESCENAS):
+    os.makedirs(directorio, exist_ok=True)
+    clave = hashlib.sha256(json.dumps(ajustes, sort_keys=True, default=str).encode()).hexdigest()
+    ruta = os.path.join(directorio, clave + ".caras")
+    if not os.path.exists(ruta):
+        guardar_caras(construir(), ruta)
+    return abrir_caras(ruta)
+
+if __name__ == "__main__":
+    import tempfile
+
+    from disperso import construir_matriz_dispersa, nucleo_contorno
+
+    # Factores de vista internos cara a cara del satélite del notebook (esfera más plancha).
+    # Solo se evalúan los pares de caras enfrentadas: la integral de contorno da valores
+    # positivos también entre caras de espaldas. No hace falta BVH porque la esfera es convexa
+    # y la plancha plana, así que ningún par enfrentado queda tapado.
+    esfera_satelite = pv.Sphere(radius=1, center=(-1.5, 0, 0), theta_resolution=20, phi_resolution=20)
+    plancha = pv.Plane(center=(0, 0, 0), direction=(-1, 0, 0), i_size=2, j_size=2)
+    caras = caras_de_malla(esfera_satelite.merge(plancha), triangular=False)
+    ajustes = {"motor": "contorno", "orden": 30, "pares": "enfrentados"}
+
+    def calcular():
+        with tempfile.TemporaryDirectory() as directorio:
+            return construir_matriz_dispersa(caras, directorio, nucleo=nucleo_contorno).toarray()
+
+    for intento in ("primera", "segunda"):
+        inicio = time.perf_counter()
+        F = matriz_en_cache(calcular, caras, ajustes)
+        print(f"{intento} ejecución: {time.perf_counter() - inicio:.3f} s, F {F.shape}, "
+              f"suma máxima de fila {F.sum(axis=1).max():.3f}")
@@ -0,0 +1,114 @@
+import numpy as np
+import pyvista as pv
+
+# Normales unitarias, áreas y centroides de un array de triángulos (N, 3, 3)
+def propiedades_triangulos(triangulos):
+    cruz = np.cross(triangulos[:, 1] - triangulos[:, 0], triangulos[:, 2] - triangulos[:, 0])
+    doble_area = np.linalg.norm(cruz, axis=1)
+    normales = cruz / np.where(doble_area > 0, doble_area, 1.0)[:, None]
+    return normales, 0.5 * doble_area, triangulos.mean(axis=1)
+
+# Normales (método de Newell), áreas y centroides de polígonos planos (N, m, 3).
+# Los polígonos con menos vértices van rellenos repitiendo el último, lo que añade
+# lados de longitud nula que no cambian ni el área ni las integrales de contorno.
+def propiedades_poligonos(poligonos):
+    vector_area = 0.5 * np.cross(poligonos, np.roll(poligonos, -1, axis=1)).sum(axis=1)
+    areas = np.linalg.norm(vector_area, axis=1)
+    normales = vector_area / np.where(areas > 0, areas, 1.0)[:, None]
+
+    # Centroide como media de los triángulos del abanico ponderada por su área
+    v0 = poligonos[:, :1]
+    a, b = poligonos[:, 1:-1], poligonos[:, 2:]
+    pesos = 0.5 * np.linalg.norm(np.cross(a - v0, b - v0), axis=2)
+    centros = (v0 + a + b) / 3
+    centroides = (pesos[:, :, None] * centros).sum(axis=1) / np.where(areas > 0, pesos.sum(axis=1), 1.0)[:, None]
+    return normales, areas, centroides
+
+# Polígonos de una malla de PyVista como array (N, m, 3) relleno, sin bucles por celda
+def _poligonos_de_malla(malla):
+    celdas = malla.GetPolys()
+    offsets = pv.convert_array(celdas.GetOffsetsArray())
+    conectividad = pv.convert_array(celdas.GetConnectivityArray())
+    tam = np.diff(offsets)
+    m = tam.max()
+    posicion = offsets[:-1, None] + np.minimum(np.arange(m)[None, :], tam[:, None] - 1)
+    return np.ascontiguousarray(malla.points[conectividad[posicion]], dtype=np.float64)
+
+# Arrays contiguos de triángulos de una malla de PyVista (se triangula si hace falta).
+# La normal de cada cara sigue el sentido de giro de sus vértices, igual que en pyviewfactor.
+# Con triangular=False se conservan los polígonos originales en la clave "poligonos".
+def caras_de_malla(malla, triangular=True):
+    if not isinstance(malla, pv.PolyData):
+        malla = malla.extract_surface()
+    if not triangular:
+        poligonos = _poligonos_de_malla(malla)
+        normales, areas, centroides = propiedades_poligonos(poligonos)
+        return {
+            "poligonos": poligonos,
+            "normales": normales,
+            "areas": areas,
+            "centroides": centroides,
+        }
+    malla = malla.triangulate()
+    indices = malla.faces.reshape(-1, 4)[:, 1:]
+    triangulos = np.ascontiguousarray(malla.points[indices], dtype=np.float64)
+    normales, areas, centroides = propiedades_triangulos(triangulos)
+    return {
+        "triangulos": triangulos,
+        "normales": normales,
+        "areas": areas,
+        "centroides": centroides,
+    }
+
+# Concatenar las caras de varias superficies guardando a qué superficie pertenece cada una
+def unir_caras(lista_caras):
+    caras = {clave: np.concatenate([c[clave] for c in lista_caras])
+             for clave in lista_caras[0]}
+    caras["superficie"] = np.concatenate(
+        [np.full(len(c["areas"]), k, dtype=np.int32) for k, c in enumerate(lista_caras)])
+    return caras
+
+# Base ortonormal (t1, t2) perpendicular a cada normal
+def base_tangente(normales):
+    auxiliar = np.where(np.abs(normales[:, :1]) > 0.9, [[0.0, 1.0, 0.0]], [[1.0, 0.0, 0.0]])
+    t1 = np.cross(normales, auxiliar)
+    t1 /= np.linalg.norm(t1, axis=1, keepdims=True)
+    return t1, np.cross(normales, t1)
+
+# Vértices únicos (V, 3) y conectividad (F, k) de las caras, para escribir o reconstruir la malla
+def malla_de_caras(caras):
+    vertices = caras["triangulos"] if "triangulos" in caras else caras["poligonos"]
+    puntos, celdas = np.unique(vertices.reshape(-1, 3), axis=0, return_inverse=True)
+    return puntos, celdas.reshape(len(vertices), -1)
+
+# Copia de las caras con los arrays de coma flotante en float32 (la mitad de memoria y de
+# ancho de banda). Solo es válido con coordenadas locales del satélite, de orden métrico;
+# las posiciones orbitales se mantienen en float64 aparte (ver sombra.en_sombra_local).
+def caras_float32(caras):
+    return {clave: array.astype(np.float32) if np.issubdtype(array.dtype, np.floating) else array
+            for clave, array in caras.items()}
+
+# Panel solar plano de lado size subdividido en n x n cuadrados (dos triángulos cada uno),
+# con la misma numeración de vértices y caras que generate_panel_mesh de los scripts Legacy
+def caras_panel(n, size=2.0):
+    eje = -size / 2 + np.arange(n + 1) * (size / n)
+    x, y = np.meshgrid(eje, eje, indexing="ij")
+    vertices = np.stack([x.ravel(), y.ravel(), np.zeros(x.size)], axis=1)
+
+    i, j = np.meshgrid(np.arange(n), np.arange(n), indexing="ij")
+    v0 = (i * (n + 1) + j).ravel()
+    v1 = v0 + 1
+    v2 = v0 + (n + 1)
+    v3 = v2 + 1
+    indices = np.stack([np.stack([v0, v1, v3], axis=1),   # Triángulo 1
+                        np.stack([v0, v3, v2], axis=1)],  # Triángulo 2
+                       axis=1).reshape(-1, 3)
+
+    triangulos = np.ascontiguousarray(vertices[indices])
+    normales, areas, centroides = propiedades_triangulos(triangulos)
+    return {
+        "triangulos": triangulos,
+        "normales": normales,
+        "areas": areas,
+        "centroides": centroides,
+    }
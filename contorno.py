@@ -0,0 +1,90 @@
+import numpy as np
+from numpy.polynomial.legendre import leggauss
+from tqdm import tqdm
+
+# Nodos y pesos de Gauss-Legendre llevados al intervalo [0, 1]
+def gauss_legendre(orden):
+    nodos, pesos = leggauss(orden)
+    return 0.5 * (nodos + 1.0), 0.5 * pesos
+
+# ∫₀¹ log|y − r| dy = (1−r)·log|1−r| + r·log|r| − 1, con 0·log 0 = 0
+def _integral_log_raiz(r):
+    a = np.abs(1.0 - r)
+    b = np.abs(r)
+    t1 = np.where(a > 1e-300, (1.0 - r) * np.log(np.where(a > 1e-300, a, 1.0)), 0.0)
+    t2 = np.where(b > 1e-300, r * np.log(np.where(b > 1e-300, b, 1.0)), 0.0)
+    return t1 + t2 - 1.0
+
+# ∫₀¹ log|A·y² + B·y + C| dy en forma cerrada para cualquier signo del discriminante,
+# igual que el núcleo SA-30 de pyviewfactor pero sobre arrays. Cada rama se evalúa
+# solo sobre los elementos que le corresponden.
+def _integral_interior(A, B, C):
+    A, B, C = (np.ravel(v) for v in np.broadcast_arrays(A, B, C))
+    I = np.zeros(A.shape)
+    delta = 4.0 * A * C - B * B
+    P1 = A + B + C
+    no_nulo = A >= 1e-300
+    separado = no_nulo & (delta > 1e-14 * A)
+
+    # Pares separados (delta > 0): fórmula con arcotangente, con
+    # atan((2A+B)/√Δ) − atan(B/√Δ) = atan2(√Δ, B + 2C).
+    # Entre caras disjuntas suele ser la única rama y se evita la copia indexada.
+    valido = separado & (C > 0) & (P1 > 0)
+    k = slice(None) if valido.all() else np.nonzero(valido)[0]
+    a, b, c, p1 = A[k], B[k], C[k], P1[k]
+    raiz = np.sqrt(delta[k])
+    I[k] = (np.log(p1) + b / (2.0 * a) * np.log(p1 / c) - 2.0
+            + raiz / a * np.arctan2(raiz, b + 2.0 * c))
+
+    # Pares que se tocan (delta <= 0): descomposición en raíces reales
+    k = np.nonzero(no_nulo & ~separado)[0]
+    if len(k):
+        a, b = A[k], B[k]
+        disc = np.sqrt(np.maximum(-delta[k], 0.0))
+        I[k] = (np.log(a) + _integral_log_raiz((-b - disc) / (2.0 * a))
+                + _integral_log_raiz((-b + disc) / (2.0 * a)))
+
+    return np.where(np.isnan(I), 0.0, I)
+
+# Integral de contorno para P pares ya emparejados: receptores (P, m1, 3), emisores (P, m2, 3).
+# Devuelve F(emisor -> receptor) = ∮∮ ln(r²) dl1·dl2 / (4π·A_emisor), recortado a >= 0.
+def factores_pares(receptores, emisores, areas_emisores, x, w):
+    e1 = np.roll(receptores, -1, axis=1) - receptores
+    e2 = np.roll(emisores, -1, axis=1) - emisores
+    nq = np.einsum("pik,pik->pi", e1, e1)
+    n_p = np.einsum("pjk,pjk->pj", e2, e2)
+    spq = np.einsum("pik,pjk->pij", e1, e2)
+
+    d = emisores[:, None, :, :] - receptores[:, :, None, :]
+    sqpq = np.einsum("pijk,pik->pij", d, e1)
+    sqpp = np.einsum("pijk,pjk->pij", d, e2)
+    nqp = np.einsum("pijk,pijk->pij", d, d)
+
+    # Integral exterior por Gauss-Legendre, interior analítica
+    B = -2.0 * sqpq[..., None] - 2.0 * x * spq[..., None]
+    C = x * x * n_p[:, None, :, None] + 2.0 * x * sqpp[..., None] + nqp[..., None]
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        I = _integral_interior(nq[:, :, None, None], B, C).reshape(B.shape)
+    total = np.einsum("pijk,k,pij->p", I, w, spq)
+    return np.maximum(total / (4.0 * np.pi * areas_emisores), 0.0)
+
+# Matriz de factores de vista cara a cara por integral de contorno a partir de arrays de caras.
+# F[i, j] es el factor de vista de la cara j del emisor a la cara i del receptor, el mismo valor
+# que pvf.compute_viewfactor(receptor_i, emisor_j). Los pares se evalúan por bloques de
+# tam_bloque sin crear ningún objeto de malla. Devuelve la matriz y su suma total.
+def matriz_contorno(receptores, emisores, areas_emisores, orden=30, tam_bloque=256):
+    receptores = np.asarray(receptores, dtype=np.float64)
+    emisores = np.asarray(emisores, dtype=np.float64)
+    areas_emisores = np.asarray(areas_emisores, dtype=np.float64)
+    x, w = gauss_legendre(orden)
+
+    n1, n2 = len(receptores), len(emisores)
+    F = np.zeros(n1 * n2)
+    with tqdm(total=n1 * n2, desc="Pares de caras", unit=" pares", unit_scale=True) as barra:
+        for a in range(0, n1 * n2, tam_bloque):
+            par = np.arange(a, min(a + tam_bloque, n1 * n2))
+            i, j = par // n2, par % n2
+            F[par] = factores_pares(receptores[i], emisores[j], areas_emisores[j], x, w)
+            barra.update(len(par))
+    F = F.reshape(n1, n2)
+    return F, F.sum()
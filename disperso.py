@@ -0,0 +1,137 @@
+import json
+import os
+
+import numpy as np
+import scipy.sparse as sp
+from tqdm import tqdm
+
+from bvh import segmentos_ocluidos
+from caras import caras_panel
+from contorno import factores_pares, gauss_legendre
+
+# Núcleo cos·cos/(πr²) entre centroides para pares (i, j) ya filtrados: F de i a j
+def nucleo_puntual(caras, i, j):
+    d = caras["centroides"][j] - caras["centroides"][i]
+    r2 = np.einsum("pk,pk->p", d, d)
+    c1 = np.einsum("pk,pk->p", caras["normales"][i], d)
+    c2 = -np.einsum("pk,pk->p", caras["normales"][j], d)
+    return c1 * c2 * caras["areas"][j] / (np.pi * r2 * r2)
+
+# Núcleo de integral de contorno (contorno.py) para pares (i, j) ya filtrados: F de i a j
+def nucleo_contorno(caras, i, j, orden=30):
+    vertices = caras["poligonos"] if "poligonos" in caras else caras["triangulos"]
+    x, w = gauss_legendre(orden)
+    # F(emisor -> receptor) con emisor i y receptor j es el factor de vista de i a j
+    return factores_pares(vertices[j], vertices[i], caras["areas"][i], x, w)
+
+# Pares (i, j) que se ven por delante el uno al otro. Los que están de espaldas y los
+# coplanares (producto escalar nulo) se descartan con tests de signo vectorizados.
+def _pares_enfrentados(caras, filas, columnas, eps):
+    c, n = caras["centroides"], caras["normales"]
+    d = c[None, columnas, :] - c[filas, None, :]
+    r = np.sqrt(np.einsum("ijk,ijk->ij", d, d))
+    delante1 = np.einsum("ik,ijk->ij", n[filas], d) > eps * r
+    delante2 = np.einsum("jk,ijk->ij", n[columnas], d) < -eps * r
+    ii, jj = np.nonzero(delante1 & delante2)
+    return filas[ii], columnas[jj]
+
+# Máximo de (x − c)·n para x en una caja [lo, hi], para varias normales y cajas a la vez
+def _soporte_caja(normales, puntos, lo, hi):
+    soporte = np.maximum(normales[:, None, :] * lo[None], normales[:, None, :] * hi[None]).sum(axis=2)
+    return soporte - np.einsum("ik,ik->i", puntos, normales)[:, None]
+
+# Matriz de factores de vista dispersa construida por bloques y guardada en formato CSR en
+# ficheros (data, indices, indptr) dentro de directorio, sin tener nunca la matriz densa en
+# memoria. Primero se descartan bloques enteros de columnas cuya caja envolvente queda detrás
+# de todas las caras del bloque de filas (o al revés), después los pares de espaldas o
+# coplanares, y solo sobre los pares que quedan se evalúa el núcleo (y la oclusión si se da
+# una bvh). Las entradas con F <= umbral no se guardan.
+def construir_matriz_dispersa(caras, directorio, nucleo=nucleo_puntual, bvh=None, umbral=0.0,
+                              tam_bloque=1024, eps=1e-9):
+    os.makedirs(directorio, exist_ok=True)
+    c, n = caras["centroides"], caras["normales"]
+    n_caras = len(c)
+    bloques = np.arange(0, n_caras, tam_bloque)
+    lo = np.minimum.reduceat(c, bloques, axis=0)
+    hi = np.maximum.reduceat(c, bloques, axis=0)
+    escala = np.linalg.norm(c.max(axis=0) - c.min(axis=0)) or 1.0
+
+    indptr = np.zeros(n_caras + 1, dtype=np.int64)
+    nnz = 0
+    with open(os.path.join(directorio, "data.bin"), "wb") as f_data, \
+            open(os.path.join(directorio, "indices.bin"), "wb") as f_indices:
+        for a in tqdm(bloques, desc="Bloques de filas"):
+            filas = np.arange(a, min(a + tam_bloque, n_caras))
+            # Descarte en bloque: alguna columna del bloque delante de alguna fila y viceversa
+            delante = (_soporte_caja(n[filas], c[filas], lo, hi) > eps * escala).any(axis=0)
+            inverso = _soporte_caja(n, c, lo[a // tam_bloque][None], hi[a // tam_bloque][None])[:, 0]
+            delante &= np.maximum.reduceat(inverso, bloques) > eps * escala
+
+            i_bloque, j_bloque, F_bloque = [], [], []
+            for b in bloques[delante]:
+                columnas = np.arange(b, min(b + tam_bloque, n_caras))
+                i, j = _pares_enfrentados(caras, filas, columnas, eps)
+                if len(i) == 0:
+                    continue
+                F = nucleo(caras, i, j)
+                if bvh is not None:
+                    F[segmentos_ocluidos(bvh, c[i], c[j], ignorar=np.stack([i, j], axis=1))] = 0.0
+                guardar = F > umbral
+                i_bloque.append(i[guardar])
+                j_bloque.append(j[guardar])
+                F_bloque.append(F[guardar])
+
+            if i_bloque:
+                i, j, F = np.concatenate(i_bloque), np.concatenate(j_bloque), np.concatenate(F_bloque)
+                orden = np.lexsort((j, i))
+                f_data.write(F[orden].astype(np.float64).tobytes())
+                f_indices.write(j[orden].astype(np.int64).tobytes())
+                indptr[filas + 1] = np.bincount(i - a, minlength=len(filas))
+                nnz += len(i)
+
+    indptr = np.cumsum(indptr)
+    indptr.tofile(os.path.join(directorio, "indptr.bin"))
+    with open(os.path.join(directorio, "matriz.json"), "w") as fichero:
+        json.dump({"forma": [n_caras, n_caras], "nnz": int(nnz)}, fichero)
+    return cargar_matriz_dispersa(directorio)
+
+# Abrir una matriz CSR guardada por construir_matriz_dispersa. Los arrays son memmaps de solo
+# lectura, así que se puede consultar (filas, productos matriz-vector) aunque no quepa en RAM.
+def cargar_matriz_dispersa(directorio):
+    with open(os.path.join(directorio, "matriz.json")) as fichero:
+        info = json.load(fichero)
+    forma, nnz = tuple(info["forma"]), info["nnz"]
+
+    def abrir(nombre, tipo, cuantos):
+        if cuantos == 0:
+            return np.zeros(0, dtype=tipo)
+        return np.memmap(os.path.join(directorio, nombre), dtype=tipo, mode="r", shape=(cuantos,))
+
+    data = abrir("data.bin", np.float64, nnz)
+    indices = abrir("indices.bin", np.int64, nnz)
+    indptr = abrir("indptr.bin", np.int64, forma[0] + 1)
+    matriz = sp.csr_matrix(forma)
+    # Se asignan los arrays directamente para que scipy no los copie ni los convierta
+    matriz.data, matriz.indices, matriz.indptr = data, indices, indptr
+    return matriz
+
+if __name__ == "__main__":
+    import tempfile
+
+    import pyvista as pv
+    from caras import caras_de_malla
+
+    with tempfile.TemporaryDirectory() as directorio:
+        # El panel plano es coplanar consigo mismo: se descarta entero sin evaluar ningún par
+        panel = caras_panel(100)
+        F = construir_matriz_dispersa(panel, os.path.join(directorio, "panel"))
+        print("Panel de", F.shape[0], "caras: entradas no nulas =", F.nnz)
+
+        # Caja cerrada vista desde dentro: solo sobreviven los pares de caras enfrentadas
+        caja = pv.Box(level=6).flip_faces()
+        caras = caras_de_malla(caja)
+        F = construir_matriz_dispersa(caras, os.path.join(directorio, "caja"), tam_bloque=256)
+        print("Caja de", F.shape[0], "caras: entradas no nulas =", F.nnz,
+              f"({F.nnz / F.shape[0]**2:.1%} de la matriz densa)")
+        print("Suma media de las filas (cierre):", round(F.sum(axis=1).mean(), 3))
+        del F  # Se sueltan los memmap antes de borrar el directorio
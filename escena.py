@@ -0,0 +1,88 @@
+import numpy as np
+import pyvista as pv
+from tqdm import tqdm
+
+from bvh import construir_bvh, segmentos_ocluidos
+from caras import caras_de_malla, unir_caras
+
+# Escena con varias superficies: caras concatenadas y una única BVH sobre todos los triángulos.
+# superficies es un diccionario nombre -> malla de PyVista.
+def crear_escena(superficies):
+    nombres = list(superficies)
+    caras = unir_caras([caras_de_malla(superficies[nombre]) for nombre in nombres])
+    return {"nombres": nombres, "caras": caras, "bvh": construir_bvh(caras["triangulos"])}
+
+# Factor de vista entre elementos con el núcleo cos·cos/(πr²) en los centroides.
+# Devuelve los pares (i, j) que se ven y F de i a j sin tener en cuenta oclusiones.
+def _factores_elementos(caras, filas, columnas):
+    ci, cj = caras["centroides"][filas], caras["centroides"][columnas]
+    d = cj[None, :, :] - ci[:, None, :]
+    r2 = np.einsum("ijk,ijk->ij", d, d)
+    c1 = np.einsum("ik,ijk->ij", caras["normales"][filas], d)
+    c2 = -np.einsum("jk,ijk->ij", caras["normales"][columnas], d)
+    ii, jj = np.nonzero((r2 > 0) & (c1 > 0) & (c2 > 0))
+    F = c1[ii, jj] * c2[ii, jj] * caras["areas"][columnas][jj] / (np.pi * r2[ii, jj] ** 2)
+    return filas[ii], columnas[jj], F
+
+# Matriz (S x S) entre superficies a partir de la de elementos (N caras x S superficies):
+# promedio ponderado por área de los elementos de cada superficie
+def factores_superficies(escena, F_elementos):
+    superficie, areas = escena["caras"]["superficie"], escena["caras"]["areas"]
+    n_sup = len(escena["nombres"])
+    A_sup = np.bincount(superficie, weights=areas, minlength=n_sup)
+    F = np.zeros((n_sup, n_sup))
+    np.add.at(F, superficie, areas[:, None] * F_elementos)
+    return F / A_sup[:, None]
+
+# Matriz de factores de vista entre todas las superficies de la escena, con oclusiones.
+# Los rayos de visibilidad entre centroides se lanzan por lotes contra la BVH común.
+# Devuelve (F, nombres); con por_elemento=True F es la matriz (N caras x S superficies) en
+# vez de la (S x S).
+def matriz_factores_ocluida(escena, tam_bloque=512, por_elemento=False):
+    caras = escena["caras"]
+    superficie = caras["superficie"]
+    centroides = caras["centroides"]
+    n_caras = len(superficie)
+    n_sup = len(escena["nombres"])
+
+    F_elementos = np.zeros((n_caras, n_sup))
+    indices = np.arange(n_caras)
+    with tqdm(total=n_caras * n_caras, desc="Pares de elementos", unit=" pares",
+              unit_scale=True) as barra:
+        for a in range(0, n_caras, tam_bloque):
+            filas = indices[a:a + tam_bloque]
+            for b in range(0, n_caras, tam_bloque):
+                columnas = indices[b:b + tam_bloque]
+                i, j, F = _factores_elementos(caras, filas, columnas)
+                # Se ignoran las caras de salida y de llegada de cada rayo
+                tapado = segmentos_ocluidos(escena["bvh"], centroides[i], centroides[j],
+                                            ignorar=np.stack([i, j], axis=1))
+                F[tapado] = 0.0
+                F_elementos += np.bincount(i * n_sup + superficie[j], weights=F,
+                                           minlength=n_caras * n_sup).reshape(n_caras, n_sup)
+                barra.update(len(filas) * len(columnas))
+
+    if por_elemento:
+        return F_elementos, escena["nombres"]
+    return factores_superficies(escena, F_elementos), escena["nombres"]
+
+if __name__ == "__main__":
+    # Dos placas paralelas enfrentadas y un disco entre ellas que tapa parte de la vista
+    placa_abajo = pv.Plane(center=(0, 0, 0), direction=(0, 0, 1), i_size=1, j_size=1,
+                           i_resolution=20, j_resolution=20)
+    placa_arriba = pv.Plane(center=(0, 0, 1), direction=(0, 0, -1), i_size=1, j_size=1,
+                            i_resolution=20, j_resolution=20)
+    obstaculo = pv.Disc(center=(0, 0, 0.5), inner=0, outer=0.25, normal=(0, 0, 1), c_res=24)
+
+    sin_obstaculo = crear_escena({"abajo": placa_abajo, "arriba": placa_arriba})
+    con_obstaculo = crear_escena({"abajo": placa_abajo, "arriba": placa_arriba,
+                                  "obstaculo": obstaculo})
+
+    F_libre, _ = matriz_factores_ocluida(sin_obstaculo)
+    F_tapado, nombres = matriz_factores_ocluida(con_obstaculo)
+
+    print("\nFactor de vista abajo -> arriba sin obstáculo:", round(F_libre[0, 1], 4),
+          "(analítico 0.1998)")
+    print("Factor de vista abajo -> arriba con obstáculo:", round(F_tapado[0, 1], 4))
+    print("Matriz de factores de vista con obstáculo:", nombres)
+    print(np.round(F_tapado, 4))
@@ -1,34 +1,102 @@
+import warnings
+
 import numpy as np
 import pyvista as pv
 from tqdm import tqdm
 
-# Función para calcular el factor de vista discretizado
-def calcular_factor_de_vista(surface1, surface2, area1, area2):
-    points1 = surface1.points
-    points2 = surface2.points
-    normals1 = surface1.point_normals
-    normals2 = surface2.point_normals
+from jerarquico import factor_de_vista_jerarquico
+
+# Núcleo cos·cos/(πr²) para un bloque de pares de puntos (b1 x b2)
+def _factor_de_vista_bloque(p1, n1, p2, n2):
+    # Diferencias por componente para no perder precisión en pares cercanos
+    dx = p2[None, :, 0] - p1[:, None, 0]
+    dy = p2[None, :, 1] - p1[:, None, 1]
+    dz = p2[None, :, 2] - p1[:, None, 2]
+    r2 = dx * dx + dy * dy + dz * dz
+
+    # cos_theta * r para cada superficie (se divide por r más abajo)
+    c1 = n1[:, None, 0] * dx + n1[:, None, 1] * dy + n1[:, None, 2] * dz
+    c2 = -(n2[None, :, 0] * dx + n2[None, :, 1] * dy + n2[None, :, 2] * dz)
 
-    factor_de_vista = 0
+    # Mismo criterio que el bucle original: r > 0 y ambos cosenos positivos
+    visible = (r2 > 0) & (c1 > 0) & (c2 > 0)
+    r2 = np.where(visible, r2, 1.0)
+    return np.sum(np.where(visible, c1 * c2 / (r2 * r2), 0.0)) / np.pi
+
+# Factor de vista entre dos nubes de puntos con normales, evaluado por bloques.
+# tam_bloque fija el número de puntos por lado del bloque: la memoria pico es
+# del orden de 8 * tam_bloque**2 floats, independiente del tamaño del problema.
+def factor_de_vista_puntos(points1, normals1, points2, normals2, area1, area2,
+                           tam_bloque=512, desc="Pares evaluados"):
+    points1 = np.asarray(points1, dtype=np.float64)
+    points2 = np.asarray(points2, dtype=np.float64)
+    normals1 = np.asarray(normals1, dtype=np.float64)
+    normals2 = np.asarray(normals2, dtype=np.float64)
 
     dA1 = area1 / len(points1)  # Área de cada punto
     dA2 = area2 / len(points2)  # Área de cada punto
 
-    for i, p1 in enumerate(tqdm(points1, desc="Procesando puntos de surface1")):
-        for j, p2 in enumerate(points2):
-            r = np.linalg.norm(p2 - p1)  # Distancia entre puntos
-            if r == 0:
-                continue
+    suma = 0.0
+    # tqdm muestra los pares por segundo del cálculo
+    with tqdm(total=len(points1) * len(points2), desc=desc, unit=" pares",
+              unit_scale=True, disable=desc is None) as barra:
+        for i in range(0, len(points1), tam_bloque):
+            p1 = points1[i:i + tam_bloque]
+            n1 = normals1[i:i + tam_bloque]
+            for j in range(0, len(points2), tam_bloque):
+                p2 = points2[j:j + tam_bloque]
+                suma += _factor_de_vista_bloque(p1, n1, p2, normals2[j:j + tam_bloque])
+                barra.update(len(p1) * len(p2))
+
+    # Normalizar por el área total de surface1
+    return suma * dA1 * dA2 / area1
+
+# Función para calcular el factor de vista discretizado
+def calcular_factor_de_vista(surface1, surface2, area1, area2, tam_bloque=512):
+    return factor_de_vista_puntos(surface1.points, surface1.point_normals,
+                                  surface2.points, surface2.point_normals,
+                                  area1, area2, tam_bloque=tam_bloque,
+                                  desc="Procesando pares surface1-surface2")
+
+# Matriz de factores de vista entre varias superficies (diccionarios nombre -> superficie
+# y nombre -> área). Cada par no ordenado se evalúa una sola vez y el factor inverso sale de
+# la reciprocidad A_i·F_ij = A_j·F_ji. Si se indica el entorno que encierra a las demás,
+# sus términos salen del cierre (cada fila suma 1) en vez de evaluar el núcleo.
+# Con theta se usa el cálculo jerárquico de jerarquico.py en lugar de todos los pares.
+def matriz_factores_de_vista(superficies, areas, entorno=None, tam_bloque=512, theta=None):
+    nombres = list(superficies)
+    A = np.array([areas[nombre] for nombre in nombres], dtype=np.float64)
+    n = len(nombres)
+    F = np.zeros((n, n))
 
-            cos_theta1 = np.dot(normals1[i], (p2 - p1) / r)  # Ángulo para surface1
-            cos_theta2 = np.dot(normals2[j], (p1 - p2) / r)  # Ángulo para surface2
+    calculadas = [k for k, nombre in enumerate(nombres) if nombre != entorno]
+    for a, i in enumerate(calculadas):
+        for j in calculadas[a:]:
+            s1, s2 = superficies[nombres[i]], superficies[nombres[j]]
+            if theta is not None:
+                F[i, j] = factor_de_vista_jerarquico(s1.points, s1.point_normals, s2.points,
+                                                     s2.point_normals, A[i], A[j], theta=theta)
+            else:
+                F[i, j] = factor_de_vista_puntos(s1.points, s1.point_normals,
+                                                 s2.points, s2.point_normals, A[i], A[j],
+                                                 tam_bloque=tam_bloque,
+                                                 desc=f"{nombres[i]} - {nombres[j]}")
+            F[j, i] = A[i] * F[i, j] / A[j]
 
-            if cos_theta1 > 0 and cos_theta2 > 0:
-                factor_de_vista += (cos_theta1 * cos_theta2 * dA1 * dA2) / (np.pi * r**2)
+    if entorno is not None:
+        e = nombres.index(entorno)
+        F[calculadas, e] = 1.0 - F[calculadas].sum(axis=1)
+        F[e, calculadas] = A[calculadas] * F[calculadas, e] / A[e]
+        F[e, e] = 1.0 - F[e].sum()
 
-    # Normalizar por el área total de surface1
-    factor_de_vista /= area1
-    return factor_de_vista
+        # Comprobación de consistencia: un término de cierre negativo indica que
+        # la discretización sobreestima los factores calculados
+        if (F[:, e] < 0).any():
+            negativos = [nombres[k] for k in np.nonzero(F[:, e] < 0)[0]]
+            warnings.warn(f"Cierre negativo hacia '{entorno}' desde {negativos}: "
+                          "la suma de factores de vista supera 1")
+
+    return F, nombres
 
 if __name__ == "__main__":
     # Crear geometrías con PyVista
@@ -47,23 +115,23 @@ if __name__ == "__main__":
     rectangulo_e = rectangulo_e.compute_normals()  # Normales hacia adentro
     entorno = entorno.compute_normals(flip_normals=True)  # Invertir las normales hacia adentro
 
-    # Calcular el factor de vista entre las superficies
+    # Calcular la matriz de factores de vista entre las superficies
     print("Calculando factores de vista...")
-    F_esfera_rect_i = calcular_factor_de_vista(esfera, rectangulo_i, area_esfera, area_rectangulo)
-    F_esfera_rect_e = calcular_factor_de_vista(esfera, rectangulo_e, area_esfera, area_rectangulo)
-    F_esfera_ento = calcular_factor_de_vista(esfera, entorno, area_esfera, 4 * np.pi * (10**2))
-
-    F_rect_i_esfera = calcular_factor_de_vista(rectangulo_i, esfera, area_rectangulo, area_esfera)
-    F_rect_e_esfera = calcular_factor_de_vista(rectangulo_e, esfera, area_rectangulo, area_esfera)
-    F_rect_i_ento = calcular_factor_de_vista(rectangulo_i, entorno, area_rectangulo, 4 * np.pi * (10**2))
-    F_rect_e_ento = calcular_factor_de_vista(rectangulo_e, entorno, area_rectangulo, 4 * np.pi * (10**2))
+    superficies = {"esfera": esfera, "rect_i": rectangulo_i, "rect_e": rectangulo_e, "entorno": entorno}
+    areas = {"esfera": area_esfera, "rect_i": area_rectangulo, "rect_e": area_rectangulo,
+             "entorno": 4 * np.pi * (10**2)}
+    F, nombres = matriz_factores_de_vista(superficies, areas, entorno="entorno")
+    k = {nombre: i for i, nombre in enumerate(nombres)}
 
     # Mostrar resultados
     print("\nResultados:")
-    print("Factor de vista entre la esfera y la cara interior del rectángulo:", round(F_esfera_rect_i, 4))
-    print("Factor de vista entre la esfera y la cara exterior del rectángulo:", round(F_esfera_rect_e, 4))
-    print("Factor de vista entre la esfera y el entorno:", round(F_esfera_ento, 4))
-    print("Factor de vista entre la cara interior del rectángulo y la esfera:", round(F_rect_i_esfera, 4))
-    print("Factor de vista entre la cara exterior del rectángulo y la esfera:", round(F_rect_e_esfera, 4))
-    print("Factor de vista entre la cara interior del rectángulo y el entorno:", round(F_rect_i_ento, 4))
-    print("Factor de vista entre la cara exterior del rectángulo y el entorno:", round(F_rect_e_ento, 4))
\ No newline at end of file
+    print("Factor de vista entre la esfera y la cara interior del rectángulo:", round(F[k["esfera"], k["rect_i"]], 4))
+    print("Factor de vista entre la esfera y la cara exterior del rectángulo:", round(F[k["esfera"], k["rect_e"]], 4))
+    print("Factor de vista entre la esfera y el entorno:", round(F[k["esfera"], k["entorno"]], 4))
+    print("Factor de vista entre la cara interior del rectángulo y la esfera:", round(F[k["rect_i"], k["esfera"]], 4))
+    print("Factor de vista entre la cara exterior del rectángulo y la esfera:", round(F[k["rect_e"], k["esfera"]], 4))
+    print("Factor de vista entre la cara interior del rectángulo y el entorno:", round(F[k["rect_i"], k["entorno"]], 4))
+    print("Factor de vista entre la cara exterior del rectángulo y el entorno:", round(F[k["rect_e"], k["entorno"]], 4))
+
+    print("\nMatriz de factores de vista:", nombres)
+    print(np.round(F, 4))
@@ -0,0 +1,164 @@
+import numpy as np
+import pyvista as pv
+from tqdm import tqdm
+
+from caras import base_tangente
+from escena import crear_escena, factores_superficies
+
+# Caras del hemicubo en el marco local (t1, t2, n) de la cara emisora: índices de los ejes
+# (u, v, vista) y signo del eje de vista. La cara superior mira según la normal; las laterales
+# solo tienen la mitad de arriba (v = componente normal entre 0 y 1).
+_CARAS_HEMICUBO = [
+    (0, 1, 2, 1.0),
+    (1, 2, 0, 1.0),
+    (1, 2, 0, -1.0),
+    (0, 2, 1, 1.0),
+    (0, 2, 1, -1.0),
+]
+
+# Factores de forma diferenciales de los píxeles de cada cara del hemicubo (resolución par).
+# Superior: ΔA / (π (u² + v² + 1)²). Lateral: v·ΔA / (π (u² + v² + 1)²).
+def _factores_pixel(resolucion):
+    h = 2.0 / resolucion
+    centros = -1 + h * (np.arange(resolucion) + 0.5)
+    u, v = np.meshgrid(centros, centros, indexing="ij")
+    superior = h * h / (np.pi * (u**2 + v**2 + 1) ** 2)
+    u, v = np.meshgrid(centros, centros[resolucion // 2:], indexing="ij")
+    lateral = v * h * h / (np.pi * (u**2 + v**2 + 1) ** 2)
+    return superior.ravel(), lateral.ravel()
+
+# Recorte de triángulos (T, 3, 3) en coordenadas (u, v, w) contra el plano cercano w > eps.
+# Un triángulo con un vértice dentro da un triángulo y con dos da dos. Devuelve los
+# triángulos recortados y el índice del triángulo original de cada uno.
+def _recortar_plano_cercano(tri, ids, eps):
+    dentro = tri[:, :, 2] > eps
+    n_dentro = dentro.sum(axis=1)
+    partes_tri, partes_ids = [tri[n_dentro == 3]], [ids[n_dentro == 3]]
+
+    def punto_corte(a, b):
+        t = (eps - a[:, 2]) / (b[:, 2] - a[:, 2])
+        return a + t[:, None] * (b - a)
+
+    for cuantos in (1, 2):
+        k = n_dentro == cuantos
+        if not k.any():
+            continue
+        # Rotar los vértices para que el vértice solitario (dentro o fuera) quede el primero
+        solitario = np.argmax(dentro[k] if cuantos == 1 else ~dentro[k], axis=1)
+        orden = (np.arange(3)[None, :] + solitario[:, None]) % 3
+        a, b, c = np.moveaxis(np.take_along_axis(tri[k], orden[:, :, None], axis=1), 1, 0)
+        if cuantos == 1:
+            partes_tri.append(np.stack([a, punto_corte(a, b), punto_corte(a, c)], axis=1))
+            partes_ids.append(ids[k])
+        else:
+            pb, pc = punto_corte(b, a), punto_corte(c, a)
+            partes_tri += [np.stack([b, c, pc], axis=1), np.stack([b, pc, pb], axis=1)]
+            partes_ids += [ids[k], ids[k]]
+    return np.concatenate(partes_tri), np.concatenate(partes_ids)
+
+# Rasterizado con z-buffer de triángulos ya proyectados: su, sv (T, 3) en la cara del hemicubo
+# y 1/w (T, 3), que es lineal en pantalla. Los píxeles tienen centros en u ∈ [-1, 1] y
+# v ∈ [v_min, 1]. Devuelve, para cada píxel cubierto, su índice y el id del triángulo más cercano.
+def _rasterizar(su, sv, inv_w, ids, n_u, n_v, v_min):
+    h = 2.0 / n_u
+    i0 = np.maximum(np.ceil((su.min(axis=1) + 1) / h - 0.5), 0).astype(np.int64)
+    i1 = np.minimum(np.floor((su.max(axis=1) + 1) / h - 0.5), n_u - 1).astype(np.int64)
+    j0 = np.maximum(np.ceil((sv.min(axis=1) - v_min) / h - 0.5), 0).astype(np.int64)
+    j1 = np.minimum(np.floor((sv.max(axis=1) - v_min) / h - 0.5), n_v - 1).astype(np.int64)
+    ancho = np.maximum(i1 - i0 + 1, 0)
+    cuenta = ancho * np.maximum(j1 - j0 + 1, 0)
+    if cuenta.sum() == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Un par (triángulo, píxel) por cada píxel de la caja envolvente de cada triángulo
+    t = np.repeat(np.arange(len(su)), cuenta)
+    k = np.arange(len(t)) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+    i = i0[t] + k % ancho[t]
+    j = j0[t] + k // ancho[t]
+    pu = -1 + h * (i + 0.5)
+    pv_ = v_min + h * (j + 0.5)
+
+    # Coordenadas baricéntricas del centro del píxel
+    x0, x1, x2 = su[t, 0], su[t, 1], su[t, 2]
+    y0, y1, y2 = sv[t, 0], sv[t, 1], sv[t, 2]
+    area = (x1 - x0) * (y2 - y0) - (x2 - x0) * (y1 - y0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        b1 = ((pu - x0) * (y2 - y0) - (x2 - x0) * (pv_ - y0)) / area
+        b2 = ((x1 - x0) * (pv_ - y0) - (pu - x0) * (y1 - y0)) / area
+    b0 = 1 - b1 - b2
+    cubierto = (area != 0) & (b0 >= 0) & (b1 >= 0) & (b2 >= 0)
+    profundidad = (b0 * inv_w[t, 0] + b1 * inv_w[t, 1] + b2 * inv_w[t, 2])[cubierto]
+    t, pixel = t[cubierto], (i * n_v + j)[cubierto]
+
+    # z-buffer: para cada píxel se queda el triángulo con mayor 1/w (el más cercano)
+    orden = np.lexsort((-profundidad, pixel))
+    pixel, t = pixel[orden], t[orden]
+    primero = np.r_[True, pixel[1:] != pixel[:-1]]
+    return pixel[primero], ids[t[primero]]
+
+# Factores de vista de una cara emisora a todas las caras por hemicubo: se proyectan todos
+# los triángulos sobre las cinco caras del hemicubo, el z-buffer resuelve las oclusiones y
+# cada píxel suma su factor de forma diferencial a la cara que se ve en él. Los píxeles
+# ocupados por la parte de atrás de una cara tapan, pero no suman.
+def _fila_hemicubo(caras, cara, resolucion, factores_pixel, eps):
+    tri, normales = caras["triangulos"], caras["normales"]
+    centro = caras["centroides"][cara] + eps * normales[cara]
+    t1, t2 = base_tangente(normales[cara][None])
+    base = np.stack([t1[0], t2[0], normales[cara]])
+    local = (tri - centro) @ base.T
+    de_frente = np.einsum("tk,tk->t", normales, centro - tri[:, 0]) > 0
+    otras = np.flatnonzero(np.arange(len(tri)) != cara)
+
+    fila = np.zeros(len(tri))
+    for (eje_u, eje_v, eje_w, signo), dF in zip(_CARAS_HEMICUBO, factores_pixel):
+        uvw = local[otras][:, :, [eje_u, eje_v, eje_w]] * [1.0, 1.0, signo]
+        recortados, ids = _recortar_plano_cercano(uvw, otras, eps)
+        if len(ids) == 0:
+            continue
+        inv_w = 1.0 / recortados[:, :, 2]
+        superior = eje_w == 2
+        n_v = resolucion if superior else resolucion // 2
+        pixel, visto = _rasterizar(recortados[:, :, 0] * inv_w, recortados[:, :, 1] * inv_w, inv_w,
+                                   ids, resolucion, n_v, -1.0 if superior else 0.0)
+        fila += np.bincount(visto, weights=dF[pixel] * de_frente[visto], minlength=len(tri))
+    return fila
+
+# Matriz de factores de vista entre las superficies de una escena (crear_escena) por hemicubos,
+# con oclusiones implícitas en el z-buffer. El coste depende de la resolución del hemicubo y
+# no del número de pares de caras con línea de vista. Misma salida que
+# escena.matriz_factores_ocluida: (F, nombres), con F (S x S) o (N caras x S) si por_elemento=True.
+def matriz_hemicubo(escena, resolucion=128, por_elemento=False, eps=1e-9):
+    caras = escena["caras"]
+    superficie = caras["superficie"]
+    n_caras, n_sup = len(superficie), len(escena["nombres"])
+    resolucion += resolucion % 2
+    factores_pixel = _factores_pixel(resolucion)
+    factores_pixel = [factores_pixel[0]] + [factores_pixel[1]] * 4
+    escala = eps * np.ptp(caras["centroides"], axis=0).max()
+
+    F_elementos = np.zeros((n_caras, n_sup))
+    for cara in tqdm(range(n_caras), desc="Hemicubos"):
+        fila = _fila_hemicubo(caras, cara, resolucion, factores_pixel, escala)
+        F_elementos[cara] = np.bincount(superficie, weights=fila, minlength=n_sup)
+
+    if por_elemento:
+        return F_elementos, escena["nombres"]
+    return factores_superficies(escena, F_elementos), escena["nombres"]
+
+if __name__ == "__main__":
+    # La misma escena que escena.py: dos placas paralelas y un disco entre ellas
+    placa_abajo = pv.Plane(center=(0, 0, 0), direction=(0, 0, 1), i_size=1, j_size=1,
+                           i_resolution=20, j_resolution=20)
+    placa_arriba = pv.Plane(center=(0, 0, 1), direction=(0, 0, -1), i_size=1, j_size=1,
+                            i_resolution=20, j_resolution=20)
+    obstaculo = pv.Disc(center=(0, 0, 0.5), inner=0, outer=0.25, normal=(0, 0, 1), c_res=24)
+
+    F_libre, _ = matriz_hemicubo(crear_escena({"abajo": placa_abajo, "arriba": placa_arriba}))
+    F_tapado, nombres = matriz_hemicubo(crear_escena({"abajo": placa_abajo, "arriba": placa_arriba,
+                                                      "obstaculo": obstaculo}))
+
+    print("\nFactor de vista abajo -> arriba sin obstáculo:", round(F_libre[0, 1], 4),
+          "(analítico 0.1998)")
+    print("Factor de vista abajo -> arriba con obstáculo:", round(F_tapado[0, 1], 4))
+    print("Matriz de factores de vista con obstáculo:", nombres)
+    print(np.round(F_tapado, 4))
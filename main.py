@@ -2,6 +2,9 @@ import numpy as np
 import pyvista as pv
 import pyviewfactor as pvf
 
+from caras import caras_de_malla
+from contorno import matriz_contorno
+
 # Crear geometrías arbitrarias
 sphere = pv.Sphere(radius=1.0, center=(0, 0, 0))
 plane = pv.Plane(center=(0, 0, 2.0), direction=(0, 0, 1), i_size=4.0, j_size=4.0)
@@ -14,24 +17,15 @@ plane_unstructured = plane.cast_to_unstructured_grid()
 sphere_mesh = pvf.fc_unstruc2poly(sphere_unstructured)
 plane_mesh = pvf.fc_unstruc2poly(plane_unstructured)
 
-# Dividir las caras de cada geometría
-sphere_faces = sphere_mesh.faces.reshape(-1, 4)[:, 1:]  # Extraer triángulos
-plane_faces = plane_mesh.faces.reshape(-1, 4)[:, 1:]    # Extraer triángulos
-
-# Calcular el factor de vista total cara a cara
-F_total = 0
-for i, sphere_face in enumerate(sphere_faces):
-    for j, plane_face in enumerate(plane_faces):
-        # Extraer parches individuales (caras)
-        sphere_patch = sphere_mesh.extract_cells([i])
-        plane_patch = plane_mesh.extract_cells([j])
-
-        # Calcular el factor de vista para este par
-        try:
-            F_ij = pvf.compute_viewfactor(sphere_patch, plane_patch)
-            F_total += F_ij
-        except Exception as e:
-            print(f"Error en el cálculo del factor de vista entre cara {i} y {j}: {e}")
+# Arrays contiguos de vértices, normales, áreas y centroides de cada cara (triángulos de la
+# esfera, cuadriláteros del plano), calculados una sola vez fuera del bucle de pares
+sphere_faces = caras_de_malla(sphere_mesh, triangular=False)
+plane_faces = caras_de_malla(plane_mesh, triangular=False)
+
+# Calcular el factor de vista total cara a cara: F_pares[i, j] es el equivalente a
+# pvf.compute_viewfactor(cara i de la esfera, cara j del plano)
+F_pares, F_total = matriz_contorno(sphere_faces["poligonos"], plane_faces["poligonos"],
+                                   plane_faces["areas"])
 
 # Mostrar el resultado total
 print(f"Factor de vista total calculado cara a cara: {F_total}")
@@ -0,0 +1,85 @@
+import warnings
+
+import numpy as np
+from scipy.stats import qmc
+from tqdm import tqdm
+
+from bvh import rayos_ocluidos
+from caras import base_tangente, caras_panel
+from sombra import interseccion_esfera
+
+# Una réplica del estimador: m muestras por cara de un Sobol aleatorizado en 4 dimensiones
+# (2 para el punto sobre el triángulo y 2 para la dirección con peso coseno en el hemisferio
+# de la normal). Con peso coseno el factor de vista es directamente la fracción de impactos.
+def _replica(caras, centro, radio, bvh, sobol, rng, m):
+    u = sobol.random(m)
+    # Rotación de Cranley-Patterson distinta para cada cara para que no compartan puntos
+    u = (u[None, :, :] + rng.random((len(caras["areas"]), 1, 4))) % 1.0
+
+    tri = caras["triangulos"]
+    s, b = np.sqrt(u[..., 0]), u[..., 1]
+    puntos = (tri[:, None, 0] * (1 - s)[..., None] + tri[:, None, 1] * (s * (1 - b))[..., None]
+              + tri[:, None, 2] * (s * b)[..., None])
+
+    r, phi = np.sqrt(u[..., 2]), 2 * np.pi * u[..., 3]
+    n = caras["normales"][:, None, :]
+    t1, t2 = base_tangente(caras["normales"])
+    direcciones = ((r * np.cos(phi))[..., None] * t1[:, None, :]
+                   + (r * np.sin(phi))[..., None] * t2[:, None, :]
+                   + np.sqrt(1 - u[..., 2])[..., None] * n)
+
+    t = interseccion_esfera(puntos, direcciones, centro, radio)
+    impacto = np.isfinite(t)
+    if bvh is not None and impacto.any():
+        # Los rayos que chocan antes con el propio satélite no llegan a la esfera. Cada rayo sale
+        # de su propia cara sin desplazarlo: se ignora esa cara, así que cuentan también los
+        # oclusores a menos de un milímetro
+        k = np.nonzero(impacto)
+        impacto[k] = ~rayos_ocluidos(bvh, puntos[k], direcciones[k], t_max=t[k], ignorar=k[0])
+    return impacto.mean(axis=1)
+
+# Factor de vista de las caras a una esfera (p. ej. la Tierra) por Monte Carlo con reducción de
+# varianza: muestreo coseno del hemisferio con Sobol aleatorizado (RQMC) y todos los rayos de
+# todas las caras en un mismo lote. Cada ronda es una réplica independiente; se para cuando el
+# error típico entre réplicas baja de error_objetivo. Con bvh (construida sobre los mismos
+# triángulos de caras) se tienen en cuenta las oclusiones del propio satélite. Devuelve (F medio ponderado por área, error típico, F por cara);
+# si se llega a max_rondas sin bajar de error_objetivo se avisa con el error alcanzado.
+def factor_vista_esfera_mc(caras, centro, radio, error_objetivo=1e-3, muestras_por_ronda=64,
+                           min_rondas=4, max_rondas=256, semilla=None, bvh=None):
+    if min_rondas < 2:
+        raise ValueError("min_rondas tiene que ser al menos 2 para estimar el error entre réplicas")
+    if max_rondas < min_rondas:
+        raise ValueError(f"max_rondas ({max_rondas}) no puede ser menor que min_rondas ({min_rondas})")
+    rng = np.random.default_rng(semilla)
+    areas = caras["areas"]
+    F_rondas = []
+    for ronda in range(max_rondas):
+        sobol = qmc.Sobol(d=4, scramble=True, seed=rng)
+        F_rondas.append(_replica(caras, centro, radio, bvh, sobol, rng, muestras_por_ronda))
+        totales = np.array(F_rondas) @ areas / areas.sum()
+        if ronda + 1 >= min_rondas:
+            error = totales.std(ddof=1) / np.sqrt(len(totales))
+            if error <= error_objetivo:
+                break
+    else:
+        warnings.warn(f"Monte Carlo sin converger en {max_rondas} rondas: error típico {error:.2e} "
+                      f"> error_objetivo {error_objetivo:.2e}")
+    return totales.mean(), error, np.mean(F_rondas, axis=0)
+
+if __name__ == "__main__":
+    from orbita import earth_radius, orbit_time, posiciones_satelite, satellite_orbit_radius
+
+    # Validación: placa mirando al nadir, F = (Rt/R)² analítico
+    placa = caras_panel(10)
+    placa_nadir = dict(placa, normales=np.tile([0.0, 0.0, -1.0], (len(placa["areas"]), 1)))
+    centro = [0.0, 0.0, -satellite_orbit_radius]
+    F, error, _ = factor_vista_esfera_mc(placa_nadir, centro, earth_radius, semilla=0)
+    print(f"Placa al nadir: F = {F:.5f} ± {error:.5f} (analítico {(earth_radius / satellite_orbit_radius)**2:.5f})")
+
+    # Factor de vista del panel de view_factor_test.py a lo largo de la órbita
+    times = np.linspace(0, orbit_time, 100)
+    view_factors = []
+    for posicion in tqdm(posiciones_satelite(times)):
+        F, error, _ = factor_vista_esfera_mc(placa, -posicion, earth_radius, semilla=0)
+        view_factors.append(F)
+    print("Factor de vista medio del panel a la Tierra:", round(np.mean(view_factors), 4))
@@ -0,0 +1,165 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from tqdm import tqdm
+
+from caras import caras_panel
+from sombra import en_sombra_local
+
+# Parámetros generales (todo en metros, a diferencia de los scripts Legacy)
+earth_radius = 6371e3  # Radio de la Tierra en m
+orbit_altitude = 300e3  # Altitud de la órbita en m
+satellite_orbit_radius = earth_radius + orbit_altitude  # Radio de la órbita
+
+# Cálculo del período orbital (en segundos)
+G = 6.67430e-11  # Constante gravitacional (m^3 kg^-1 s^-2)
+M = 5.972e24  # Masa de la Tierra (kg)
+orbit_time = 2 * np.pi * np.sqrt(satellite_orbit_radius**3 / (G * M))  # Período orbital en segundos
+angular_velocity = 2 * np.pi / orbit_time  # Velocidad angular (rad/s)
+
+# Posiciones del satélite en la órbita circular del plano XY para un array de tiempos (T, 3)
+def posiciones_satelite(tiempos, radio=satellite_orbit_radius, velocidad=angular_velocity):
+    theta = velocidad * np.asarray(tiempos, dtype=np.float64)
+    return radio * np.stack([np.cos(theta), np.sin(theta), np.zeros_like(theta)], axis=-1)
+
+# Iluminación de cada cara del satélite a lo largo de la órbita, como array (T x F).
+# Se evalúan bloques de pasos de tiempo y caras de una vez; tam_bloque limita el número
+# de pares (tiempo, cara) por bloque y con ello la memoria.
+#  - direccion_sol: Sol en el infinito.
+#  - posicion_sol: Sol a distancia finita; la dirección al Sol se toma desde el satélite en
+#    cada paso (la diferencia entre caras es del orden de tamaño / distancia al Sol).
+# Las caras están en coordenadas locales del satélite y la sombra se calcula con
+# sombra.en_sombra_local, así que pueden guardarse en float32 (caras.caras_float32).
+# Con coseno=False se devuelve la máscara iluminado/a oscuras; con coseno=True, el coseno
+# de incidencia max(n·s, 0) de las caras iluminadas.
+def iluminacion_orbita(tiempos, caras, direccion_sol=(1.0, 0.0, 0.0), posicion_sol=None,
+                       coseno=False, radio_planeta=earth_radius, tam_bloque=4_000_000,
+                       progreso=True):
+    tiempos = np.asarray(tiempos, dtype=np.float64)
+    centroides = caras["centroides"]
+    n_caras = len(centroides)
+    salida = np.zeros((len(tiempos), n_caras), dtype=np.float64 if coseno else bool)
+    paso = max(1, tam_bloque // n_caras)
+
+    for a in tqdm(range(0, len(tiempos), paso), desc="Bloques de tiempo", disable=not progreso):
+        posiciones = posiciones_satelite(tiempos[a:a + paso])
+        if posicion_sol is None:
+            s = np.broadcast_to(np.asarray(direccion_sol, dtype=np.float64), posiciones.shape)
+        else:
+            s = np.asarray(posicion_sol, dtype=np.float64) - posiciones
+        s = s / np.linalg.norm(s, axis=-1, keepdims=True)
+        oscuro = en_sombra_local(centroides, posiciones, s, radio_planeta)
+
+        if coseno:
+            cos = (caras["normales"] @ s.T.astype(caras["normales"].dtype)).T
+            salida[a:a + paso] = np.where(oscuro, 0.0, np.maximum(cos, 0.0))
+        else:
+            salida[a:a + paso] = ~oscuro
+    return salida
+
+# Área iluminada total del satélite en cada instante (la curva que pintan los scripts Legacy)
+def area_iluminada(tiempos, caras, **kwargs):
+    return iluminacion_orbita(tiempos, caras, **kwargs) @ caras["areas"]
+
+# Radio angular aparente del Sol visto desde la Tierra (rad)
+sun_angular_radius = 4.65e-3
+
+# Instantes de entrada y salida de la umbra cilíndrica para la órbita circular del plano XY,
+# en forma cerrada. Con r(t)·s = R·ρ·cos(θ − φ), el satélite está a oscuras cuando
+# cos(θ − φ) < −√(R² − Rt²) / (R·ρ). Devuelve (t_entrada, t_salida) dentro de [0, periodo),
+# o None si la órbita no entra nunca en sombra.
+def eventos_eclipse(direccion_sol=(1.0, 0.0, 0.0), radio=satellite_orbit_radius,
+                    velocidad=angular_velocity, radio_planeta=earth_radius):
+    s = np.asarray(direccion_sol, dtype=np.float64)
+    s = s / np.linalg.norm(s)
+    rho = np.hypot(s[0], s[1])
+    if rho == 0:
+        return None
+    kappa = np.sqrt(radio**2 - radio_planeta**2) / (radio * rho)
+    if kappa >= 1:
+        return None
+    phi = np.arctan2(s[1], s[0])
+    alfa = np.arccos(kappa)
+    periodo = 2 * np.pi / velocidad
+    t_entrada = ((phi + np.pi - alfa) / velocidad) % periodo
+    t_salida = ((phi + np.pi + alfa) / velocidad) % periodo
+    return t_entrada, t_salida
+
+# Ventanas de transición (t0, t1) alrededor de cada evento en las que alguna cara puede
+# cambiar de estado. Su semianchura es la distancia que tiene que recorrer la frontera de
+# sombra (tamaño del satélite más la penumbra) dividida por la velocidad con la que el
+# satélite se aleja del eje de la sombra en ese instante.
+def ventanas_eclipse(extension, direccion_sol=(1.0, 0.0, 0.0), radio=satellite_orbit_radius,
+                     velocidad=angular_velocity, radio_planeta=earth_radius, seguridad=2.0):
+    eventos = eventos_eclipse(direccion_sol, radio, velocidad, radio_planeta)
+    if eventos is None:
+        return []
+    s = np.asarray(direccion_sol, dtype=np.float64)
+    s = s / np.linalg.norm(s)
+    periodo = 2 * np.pi / velocidad
+    penumbra = np.sqrt(radio**2 - radio_planeta**2) * sun_angular_radius
+
+    ventanas = []
+    for t in eventos:
+        r = posiciones_satelite(t, radio, velocidad)
+        v = radio * velocidad * np.array([-np.sin(velocidad * t), np.cos(velocidad * t), 0.0])
+        rapidez = abs(np.dot(r, s) * np.dot(v, s)) / radio_planeta  # d(distancia al eje)/dt
+        semi = seguridad * (extension + penumbra) / max(rapidez, 1e-12)
+        semi = min(semi, periodo / 2)
+        ventanas.append((t - semi, t + semi))
+    return ventanas
+
+# Subconjunto de los tiempos pedidos que hace falta evaluar: todos los que caen dentro de
+# una ventana de transición (módulo el periodo) y uno cada paso_grueso segundos fuera.
+def tiempos_adaptativos(tiempos, ventanas, paso_grueso=60.0, periodo=orbit_time):
+    tiempos = np.asarray(tiempos, dtype=np.float64)
+    elegido = np.zeros(len(tiempos), dtype=bool)
+    for t0, t1 in ventanas:
+        fase = (tiempos - t0) % periodo
+        elegido |= fase <= t1 - t0
+    bloque = np.floor((tiempos - tiempos[0]) / paso_grueso)
+    elegido[np.r_[True, bloque[1:] != bloque[:-1]]] = True
+    elegido[-1] = True
+
+    # Incluir también los vecinos de cada ventana para que la interpolación no cruce eventos
+    borde = np.flatnonzero(np.diff(elegido.astype(np.int8)) != 0)
+    elegido[borde] = True
+    elegido[np.minimum(borde + 1, len(tiempos) - 1)] = True
+    return elegido
+
+# Curva de área iluminada en los tiempos pedidos calculando solo en las ventanas de eclipse
+# y con paso grueso fuera de ellas, donde la iluminación no cambia. El resto de valores se
+# interpolan, así que la curva coincide con la del muestreo uniforme completo.
+# Devuelve la curva y el número de instantes realmente evaluados.
+def area_iluminada_adaptativa(tiempos, caras, paso_grueso=60.0, direccion_sol=(1.0, 0.0, 0.0),
+                              posicion_sol=None, **kwargs):
+    tiempos = np.asarray(tiempos, dtype=np.float64)
+    s = direccion_sol if posicion_sol is None else posicion_sol
+    extension = np.linalg.norm(caras["centroides"], axis=1).max()
+    ventanas = ventanas_eclipse(extension, s)
+    elegido = tiempos_adaptativos(tiempos, ventanas, paso_grueso)
+    areas = area_iluminada(tiempos[elegido], caras, direccion_sol=direccion_sol,
+                           posicion_sol=posicion_sol, **kwargs)
+    return np.interp(tiempos, tiempos[elegido], areas), int(elegido.sum())
+
+if __name__ == "__main__":
+    # Crear un panel solar subdividido (N x N cuadraditos)
+    n = 50  # Número de subdivisiones por lado
+    panel = caras_panel(n)
+
+    # Calcular áreas iluminadas con paso de 1 s, como test_rays_from_sat.py
+    time_step = 1.0
+    times = np.arange(0, orbit_time, time_step)
+    print("Calculando áreas iluminadas con panel subdividido...")
+    illuminated_areas, evaluados = area_iluminada_adaptativa(times, panel, paso_grueso=300.0,
+                                                             direccion_sol=(1.0, 0.0, 0.0))
+    print(f"Instantes evaluados: {evaluados} de {len(times)}")
+
+    # Graficar la evolución del área iluminada
+    plt.figure(figsize=(10, 6))
+    plt.plot(times / 60, illuminated_areas / panel["areas"].sum(), label="Proporción de área iluminada", color="green")
+    plt.title(f"Área iluminada del panel solar con {n}x{n} subdivisiones")
+    plt.xlabel("Tiempo (min)")
+    plt.ylabel("Proporción de área iluminada")
+    plt.grid()
+    plt.legend()
+    plt.show()
@@ -0,0 +1,91 @@
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+from tqdm import tqdm
+
+from cache import abrir_caras, guardar_caras
+from caras import caras_panel
+from orbita import area_iluminada, orbit_time
+
+# Arrays de caras del proceso trabajador (se rellenan una vez en el inicializador)
+_caras = None
+_memorias = []
+
+# Copiar cada array de caras a un bloque de memoria compartida. Devuelve los bloques
+# (para liberarlos al final) y la descripción que necesitan los trabajadores para abrirlos.
+def _publicar_caras(caras):
+    memorias, descripcion = [], {}
+    for clave, array in caras.items():
+        array = np.ascontiguousarray(array)
+        memoria = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=memoria.buf)[...] = array
+        memorias.append(memoria)
+        descripcion[clave] = (memoria.name, array.shape, array.dtype.str)
+    return memorias, descripcion
+
+# Inicializador de cada trabajador: abre la memoria compartida sin copiar nada. Si la
+# descripción es la ruta de un fichero de cache.guardar_caras, se abre como memmap.
+def _inicializar_trabajador(descripcion):
+    global _caras
+    if isinstance(descripcion, str):
+        _caras = abrir_caras(descripcion)
+        return
+    _caras = {}
+    for clave, (nombre, forma, tipo) in descripcion.items():
+        memoria = shared_memory.SharedMemory(name=nombre)
+        _memorias.append(memoria)
+        array = np.ndarray(forma, dtype=tipo, buffer=memoria.buf)
+        array.flags.writeable = False
+        _caras[clave] = array
+
+def _ejecutar_trozo(args):
+    funcion, tiempos, kwargs = args
+    return funcion(tiempos, _caras, **kwargs)
+
+# Barrido de una órbita repartido entre procesos. funcion(tiempos, caras, **kwargs) tiene que
+# ser una función de módulo (p. ej. orbita.area_iluminada) y devolver un array cuyo primer
+# eje son los tiempos. Las caras se publican una sola vez en memoria compartida y cada tarea
+# solo envía su trozo contiguo de tiempos, así que no se serializa la malla en cada paso.
+# caras también puede ser la ruta de un fichero de cache.guardar_caras: entonces no se copia
+# nada y cada trabajador abre el fichero como memmap de solo lectura.
+def barrido_orbita(funcion, tiempos, caras, procesos=None, trozos_por_proceso=4, **kwargs):
+    procesos = procesos or mp.cpu_count()
+    trozos = np.array_split(np.asarray(tiempos), procesos * trozos_por_proceso)
+    tareas = [(funcion, trozo, kwargs) for trozo in trozos if len(trozo)]
+
+    if isinstance(caras, (str, os.PathLike)):
+        memorias, descripcion = [], os.fspath(caras)
+    else:
+        memorias, descripcion = _publicar_caras(caras)
+    try:
+        with mp.Pool(processes=procesos, initializer=_inicializar_trabajador,
+                     initargs=(descripcion,)) as pool:
+            resultados = list(tqdm(pool.imap(_ejecutar_trozo, tareas), total=len(tareas),
+                                   desc="Trozos de órbita"))
+    finally:
+        for memoria in memorias:
+            memoria.close()
+            memoria.unlink()
+    return np.concatenate(resultados)
+
+if __name__ == "__main__":
+    import tempfile
+
+    # Panel de test_rays_from_sun.py (n = 506, unos 512k triángulos) con paso de 1 s
+    n = 506
+    panel = caras_panel(n)
+    times = np.arange(0, orbit_time, 1.0)
+
+    print("Calculando áreas iluminadas en paralelo con memoria compartida...")
+    illuminated_areas = barrido_orbita(area_iluminada, times, panel,
+                                       posicion_sol=(1e11, 0, 0), progreso=False)
+    print("Proporción media de área iluminada:", round(np.mean(illuminated_areas) / panel["areas"].sum(), 4))
+
+    # Lo mismo con el panel compilado a fichero (temporal): los trabajadores solo lo abren
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "panel_506.caras")
+        guardar_caras(panel, ruta)
+        illuminated_areas = barrido_orbita(area_iluminada, times, ruta, posicion_sol=(1e11, 0, 0), progreso=False)
+    print("Proporción media de área iluminada (fichero):", round(np.mean(illuminated_areas) / panel["areas"].sum(), 4))
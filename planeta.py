@@ -0,0 +1,168 @@
+import warnings
+
+import numpy as np
+
+from caras import caras_panel
+from montecarlo import factor_vista_esfera_mc
+from orbita import earth_radius, orbit_time, posiciones_satelite, satellite_orbit_radius
+
+# Factor de vista en forma cerrada de un elemento plano diferencial a una esfera.
+# H = distancia al centro / radio de la esfera, gamma = ángulo entre la normal y el nadir.
+#  - Vista completa (gamma <= π/2 − φm, sen φm = 1/H): F = cos γ / H²
+#  - Sin vista (gamma >= π/2 + φm): F = 0
+#  - Horizonte parcial: F = 1/2 − asen(√(H²−1) / (H sen γ)) / π
+#                         + [cos γ · acos(−√(H²−1) cot γ) − √(H²−1) · √(1 − H² cos² γ)] / (π H²)
+# H y gamma se combinan por broadcasting (p. ej. (T, 1) y (T, F)).
+def factor_vista_planeta(H, gamma):
+    H, gamma = np.broadcast_arrays(np.asarray(H, dtype=np.float64), np.asarray(gamma, dtype=np.float64))
+    raiz = np.sqrt(H**2 - 1)
+    phi_m = np.arcsin(1 / H)
+    cos_g, sen_g = np.cos(gamma), np.sin(gamma)
+
+    completa = gamma <= np.pi / 2 - phi_m
+    nula = gamma >= np.pi / 2 + phi_m
+    parcial = ~completa & ~nula
+
+    F = np.where(completa, cos_g / H**2, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        g, h, r = gamma[parcial], H[parcial], raiz[parcial]
+        F[parcial] = (0.5 - np.arcsin(np.clip(r / (h * np.sin(g)), -1, 1)) / np.pi
+                      + (np.cos(g) * np.arccos(np.clip(-r * np.cos(g) / np.sin(g), -1, 1))
+                         - r * np.sqrt(np.maximum(1 - h**2 * np.cos(g)**2, 0))) / (np.pi * h**2))
+    return F
+
+# Factor de vista de cada cara a la esfera a partir de la geometría: normales (F, 3) y
+# posición del centro de la esfera relativa a cada cara o al satélite (..., 3)
+def factor_vista_planeta_caras(normales, centro, radio=earth_radius):
+    centro = np.asarray(centro, dtype=np.float64)
+    distancia = np.linalg.norm(centro, axis=-1, keepdims=True)
+    nadir = centro / distancia
+    cos_gamma = np.einsum("...k,fk->...f", nadir, normales)
+    return factor_vista_planeta(distancia / radio, np.arccos(np.clip(cos_gamma, -1, 1)))
+
+# Factor de vista de las caras del satélite a la Tierra a lo largo de la órbita (T x F)
+def factor_vista_tierra_orbita(tiempos, caras, radio=earth_radius):
+    return factor_vista_planeta_caras(caras["normales"], -posiciones_satelite(tiempos), radio)
+
+# Factor de vista de las caras a una esfera eligiendo el método: si la esfera es el único
+# cuerpo (sin bvh de oclusores) se usa la forma cerrada, exacta y sin rayos; si no, Monte
+# Carlo. Devuelve lo mismo que factor_vista_esfera_mc: (F medio, error típico, F por cara).
+def factor_vista_esfera(caras, centro, radio, bvh=None, **kwargs):
+    if bvh is None:
+        relativo = np.asarray(centro, dtype=np.float64) - caras["centroides"]
+        distancia = np.linalg.norm(relativo, axis=1)
+        cos_gamma = np.einsum("fk,fk->f", relativo, caras["normales"]) / distancia
+        F_caras = factor_vista_planeta(distancia / radio, np.arccos(np.clip(cos_gamma, -1, 1)))
+        return F_caras @ caras["areas"] / caras["areas"].sum(), 0.0, F_caras
+    return factor_vista_esfera_mc(caras, centro, radio, bvh=bvh, **kwargs)
+
+# Interpolación bilineal en una tabla (altitud, ángulo) para arrays de cualquier forma.
+# Las altitudes fuera del rango de la tabla no se recortan al borde: se evalúan con la misma
+# fuente con la que se rellenó la tabla. Una tabla leída de disco ya no tiene la función; si su
+# fuente no era la forma cerrada, se usa la forma cerrada y se avisa del cambio de modelo.
+def interpolar_tabla(tabla, altitudes, angulos):
+    altitudes, angulos = np.broadcast_arrays(np.asarray(altitudes, dtype=np.float64),
+                                             np.asarray(angulos, dtype=np.float64))
+    ejes, pesos = [], []
+    for valores, rejilla in ((altitudes, tabla["altitudes"]), (angulos, tabla["angulos"])):
+        i = np.clip(np.searchsorted(rejilla, valores) - 1, 0, len(rejilla) - 2)
+        t = np.clip((valores - rejilla[i]) / (rejilla[i + 1] - rejilla[i]), 0.0, 1.0)
+        ejes.append(i)
+        pesos.append(t)
+    (i, j), (ta, tg) = ejes, pesos
+    v = tabla["valores"]
+    F = ((1 - ta) * ((1 - tg) * v[i, j] + tg * v[i, j + 1])
+         + ta * ((1 - tg) * v[i + 1, j] + tg * v[i + 1, j + 1]))
+
+    fuera = (altitudes < tabla["altitudes"][0]) | (altitudes > tabla["altitudes"][-1])
+    if fuera.any():
+        radio = tabla["radio"]
+        fuente = tabla.get("fuente")
+        if fuente is None:
+            fuente = factor_vista_planeta
+            if str(tabla.get("nombre_fuente", fuente.__name__)) != fuente.__name__:
+                warnings.warn(f"Altitudes fuera de la tabla evaluadas con la forma cerrada en vez de "
+                              f"con su fuente '{tabla['nombre_fuente']}'")
+        F = np.where(fuera, fuente((radio + altitudes) / radio, angulos), F)
+    return F
+
+# Tabla del factor de vista a la Tierra en función de la altitud y del ángulo normal-nadir.
+# Se refina la rejilla (duplicando el eje con más error) hasta que el error de interpolación
+# medido en los puntos medios de las celdas baja de tolerancia o se llega a max_puntos (en
+# ese caso se avisa de que la tabla no cumple la tolerancia).
+# fuente(H, gamma) es la referencia con la que se rellena: por defecto la forma cerrada.
+def construir_tabla_planeta(altitud_min=200e3, altitud_max=2000e3, n_altitudes=9, n_angulos=33,
+                            tolerancia=1e-4, radio=earth_radius, fuente=factor_vista_planeta,
+                            max_puntos=1_000_000):
+    while True:
+        altitudes = np.linspace(altitud_min, altitud_max, n_altitudes)
+        angulos = np.linspace(0, np.pi, n_angulos)
+        tabla = {
+            "altitudes": altitudes,
+            "angulos": angulos,
+            "valores": fuente(((radio + altitudes) / radio)[:, None], angulos[None, :]),
+            "radio": radio,
+            "fuente": fuente,
+            "nombre_fuente": getattr(fuente, "__name__", repr(fuente)),
+        }
+
+        # Error en los puntos medios de cada eje y en los centros de las celdas
+        alt_medias = 0.5 * (altitudes[1:] + altitudes[:-1])
+        ang_medios = 0.5 * (angulos[1:] + angulos[:-1])
+        errores = []
+        for a, g in ((alt_medias[:, None], angulos[None, :]), (altitudes[:, None], ang_medios[None, :]),
+                     (alt_medias[:, None], ang_medios[None, :])):
+            exacto = fuente((radio + a) / radio, g)
+            errores.append(np.abs(interpolar_tabla(tabla, a, g) - exacto).max())
+        tabla["error"] = max(errores)
+
+        if tabla["error"] <= tolerancia:
+            return tabla
+        if 4 * n_altitudes * n_angulos > max_puntos:
+            warnings.warn(f"Tabla limitada a {n_altitudes} x {n_angulos} puntos por max_puntos: "
+                          f"error de interpolación {tabla['error']:.2e} > tolerancia {tolerancia:.2e}")
+            return tabla
+        if errores[0] > errores[1]:
+            n_altitudes = 2 * n_altitudes - 1
+        else:
+            n_angulos = 2 * n_angulos - 1
+
+# La función fuente no se guarda, solo su nombre
+def guardar_tabla(tabla, ruta):
+    np.savez(ruta, **{clave: valor for clave, valor in tabla.items() if clave != "fuente"})
+
+def cargar_tabla(ruta):
+    with np.load(ruta) as datos:
+        return {clave: datos[clave] for clave in datos.files}
+
+# Factor de vista de cada cara a la Tierra a lo largo de la órbita (T x F) leyendo la tabla:
+# en cada paso solo hay que calcular la altitud y el ángulo de cada cara e interpolar
+def factor_vista_tierra_orbita_tabla(tiempos, caras, tabla):
+    centro = -posiciones_satelite(tiempos)
+    distancia = np.linalg.norm(centro, axis=-1, keepdims=True)
+    cos_gamma = np.einsum("tk,fk->tf", centro / distancia, caras["normales"])
+    return interpolar_tabla(tabla, distancia - tabla["radio"], np.arccos(np.clip(cos_gamma, -1, 1)))
+
+if __name__ == "__main__":
+    # Validación con Monte Carlo para varias orientaciones de una placa respecto al nadir
+    H = satellite_orbit_radius / earth_radius
+    placa = caras_panel(2)
+    print("gamma (º)   forma cerrada   Monte Carlo")
+    for gamma in np.radians([0, 30, 60, 75, 90, 105, 110, 120]):
+        normal = np.array([np.sin(gamma), 0.0, -np.cos(gamma)])
+        girada = dict(placa, normales=np.tile(normal, (len(placa["areas"]), 1)))
+        F_mc, error, _ = factor_vista_esfera_mc(girada, [0, 0, -satellite_orbit_radius], earth_radius,
+                                                error_objetivo=2e-4, max_rondas=2048, semilla=0)
+        print(f"{np.degrees(gamma):8.1f}   {factor_vista_planeta(H, gamma):13.5f}   {F_mc:.5f} ± {error:.5f}")
+
+    # Todas las caras en todos los pasos de tiempo de una órbita de una vez
+    panel = caras_panel(10)
+    times = np.arange(0, orbit_time, 1.0)
+    F = factor_vista_tierra_orbita(times, panel)
+    print("Matriz de factores de vista tiempo x cara:", F.shape, "media", round(F.mean(), 4))
+
+    # Tabla (altitud, ángulo) construida una vez y consultada en cada paso
+    tabla = construir_tabla_planeta(tolerancia=1e-4)
+    print("Tabla:", tabla["valores"].shape, "error máximo de interpolación", f"{tabla['error']:.2e}")
+    F_tabla = factor_vista_tierra_orbita_tabla(times, panel, tabla)
+    print("Diferencia máxima tabla - forma cerrada en la órbita:", f"{np.abs(F_tabla - F).max():.2e}")
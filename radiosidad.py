@@ -0,0 +1,113 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import LinearOperator, cg, spsolve_triangular
+
+sigma = 5.670374419e-8  # Constante de Stefan-Boltzmann (W m^-2 K^-4)
+
+# Sistema de intercambio radiativo entre caras grises y difusas a partir de una matriz de
+# factores de vista dispersa F (F[i, j] de i a j, p. ej. la de disperso.construir_matriz_dispersa),
+# las áreas y las emisividades. La radiosidad J cumple
+#   J = ε·Eb + ρ·(F·J + G),   ρ = 1 − ε
+# con Eb = σT⁴ y G la irradiancia externa (Sol, albedo, IR de la Tierra) sobre cada cara.
+# Todo lo que no depende de las temperaturas ni de G se prepara aquí una sola vez.
+#  - "jacobi": J ← b + ρ·F·J, un producto matriz-vector por iteración.
+#  - "gauss_seidel": (I − ρ·L)·J_nueva = b + ρ·U·J, con L la parte triangular inferior de F.
+#  - "cg": gradiente conjugado sobre la forma simétrica (A/ρ)·J − A·F·J = A·b/ρ, que lo es
+#    si F cumple la reciprocidad A_i·F_ij = A_j·F_ji (se simetriza para absorber el error
+#    numérico). Las caras negras (ρ = 0) tienen J = b directamente y salen del sistema.
+def sistema_radiosidad(F, areas, emisividad, metodo="gauss_seidel"):
+    F = sp.csr_matrix(F)
+    n = F.shape[0]
+    emisividad = np.broadcast_to(np.asarray(emisividad, dtype=np.float64), (n,)).copy()
+    rho = 1.0 - emisividad
+    sistema = {"F": F, "areas": np.asarray(areas, dtype=np.float64), "emisividad": emisividad,
+               "rho": rho, "metodo": metodo}
+    rhoF = sp.diags(rho) @ F
+
+    if metodo == "jacobi":
+        sistema["rhoF"] = rhoF.tocsr()
+    elif metodo == "gauss_seidel":
+        sistema["inferior"] = (sp.eye(n, format="csr") - sp.tril(rhoF, format="csr")).tocsr()
+        sistema["superior"] = sp.triu(rhoF, k=1, format="csr")
+    elif metodo == "cg":
+        libres = np.flatnonzero(rho > 0)
+        negras = np.flatnonzero(rho == 0)
+        AF = sp.diags(sistema["areas"]) @ F
+        AF = 0.5 * (AF + AF.T)
+        M = sp.diags(sistema["areas"][libres] / rho[libres]) - AF[libres][:, libres]
+        sistema.update(libres=libres, negras=negras, M=M.tocsr(), acople=AF[libres][:, negras].tocsr(),
+                       precondicionador=1.0 / M.diagonal())
+    else:
+        raise ValueError(f"Método desconocido: {metodo}")
+    return sistema
+
+# Residuo relativo ‖J − ρ·F·J − b‖∞ / ‖b‖∞ del sistema original
+def _residuo(sistema, J, b):
+    r = J - sistema["rho"] * (sistema["F"] @ J) - b
+    return np.abs(r).max() / max(np.abs(b).max(), 1e-300)
+
+# Resolver el intercambio radiativo para unas temperaturas (K) y una irradiancia externa G
+# (W/m², opcional). J0 es la radiosidad de partida: en un barrido de órbita se pasa la del paso
+# anterior y bastan unas pocas iteraciones. Devuelve (J, q, iteraciones), con q el flujo neto
+# que pierde cada cara por radiación (W/m²): q = J − (F·J + G).
+def resolver_radiosidad(sistema, temperaturas, irradiancia=None, J0=None, tolerancia=1e-10,
+                        max_iteraciones=1000):
+    F, rho, emisividad = sistema["F"], sistema["rho"], sistema["emisividad"]
+    G = np.zeros(F.shape[0]) if irradiancia is None else np.asarray(irradiancia, dtype=np.float64)
+    b = emisividad * sigma * np.asarray(temperaturas, dtype=np.float64) ** 4 + rho * G
+    J = b.copy() if J0 is None else np.array(J0, dtype=np.float64)
+
+    iteraciones = 0
+    if sistema["metodo"] == "cg":
+        libres, negras = sistema["libres"], sistema["negras"]
+        J[negras] = b[negras]
+        A = sistema["areas"][libres]
+        lado_derecho = A * b[libres] / rho[libres] + sistema["acople"] @ J[negras]
+        P = sistema["precondicionador"]
+        contador = []
+        J[libres], _ = cg(sistema["M"], lado_derecho, x0=J[libres], rtol=tolerancia, maxiter=max_iteraciones,
+                          M=LinearOperator(sistema["M"].shape, matvec=lambda x: P * x),
+                          callback=lambda x: contador.append(1))
+        iteraciones = len(contador)
+    else:
+        while _residuo(sistema, J, b) > tolerancia and iteraciones < max_iteraciones:
+            if sistema["metodo"] == "jacobi":
+                J = b + sistema["rhoF"] @ J
+            else:
+                J = spsolve_triangular(sistema["inferior"], b + sistema["superior"] @ J, lower=True)
+            iteraciones += 1
+
+    return J, J - (F @ J + G), iteraciones
+
+if __name__ == "__main__":
+    import tempfile
+
+    import pyvista as pv
+
+    from bvh import construir_bvh
+    from caras import caras_de_malla, unir_caras
+    from disperso import construir_matriz_dispersa
+
+    # Dos esferas concéntricas: la interior caliente y la exterior fría vista por dentro
+    r1, r2, e1, e2 = 1.0, 2.0, 0.8, 0.5
+    caras = unir_caras([caras_de_malla(pv.Sphere(radius=r1, theta_resolution=20, phi_resolution=20)),
+                        caras_de_malla(pv.Sphere(radius=r2, theta_resolution=20, phi_resolution=20).flip_faces())])
+    interior = caras["superficie"] == 0
+    with tempfile.TemporaryDirectory() as directorio:
+        # Copia en memoria para poder borrar el directorio temporal
+        F = construir_matriz_dispersa(caras, directorio, bvh=construir_bvh(caras["triangulos"])).copy()
+    emisividad = np.where(interior, e1, e2)
+    A1, A2 = caras["areas"][interior].sum(), caras["areas"][~interior].sum()
+
+    # Calor neto de la esfera interior a lo largo de un barrido de temperaturas, arrancando
+    # cada paso desde la radiosidad del anterior
+    for metodo in ("jacobi", "gauss_seidel", "cg"):
+        sistema = sistema_radiosidad(F, caras["areas"], emisividad, metodo)
+        J = None
+        print(f"\n{metodo}:")
+        for T1 in np.linspace(400, 420, 5):
+            temperaturas = np.where(interior, T1, 300.0)
+            J, q, iteraciones = resolver_radiosidad(sistema, temperaturas, J0=J)
+            Q = q[interior] @ caras["areas"][interior]
+            analitico = sigma * A1 * (T1**4 - 300.0**4) / (1 / e1 + A1 / A2 * (1 / e2 - 1))
+            print(f"  T1 = {T1:.0f} K: Q = {Q:.1f} W (analítico {analitico:.1f} W), {iteraciones} iteraciones")
@@ -0,0 +1,105 @@
+import mitsuba as mi
+import numpy as np
+from tqdm import tqdm
+
+from caras import caras_panel, malla_de_caras
+from orbita import earth_radius, orbit_time
+from satelite import actitud_inercial, pose_satelite, puntos_a_cuerpo
+
+mi.set_variant("scalar_rgb")
+
+# Escena de Mitsuba cargada una sola vez en el marco del cuerpo del satélite: la malla se crea
+# en memoria a partir de los arrays de caras (sin ficheros .obj temporales) y queda quieta en
+# el origen; lo que se mueve en cada paso son la Tierra y el Sol. Así además las coordenadas
+# en float32 de Mitsuba quedan a escala del satélite en vez de a 6.7e6 m. irradiancia es la
+# que llega del Sol al satélite (W/m²): por defecto 1 para que las imágenes queden en [0, 1];
+# con constante_solar de termico.py salen en unidades físicas.
+def escena_mitsuba(caras, reflectancia=0.8, radio_planeta=earth_radius, irradiancia=1.0,
+                   resolucion=(320, 180), camara=(0.0, 0.0, -5.0)):
+    puntos, celdas = malla_de_caras(caras)
+    malla = mi.Mesh("panel", len(puntos), len(celdas), has_vertex_normals=False)
+    parametros_malla = mi.traverse(malla)
+    # Los buffers se rellenan con el mismo tipo de array que usa la variante activa
+    tipo_puntos, tipo_caras = type(parametros_malla["vertex_positions"]), type(parametros_malla["faces"])
+    parametros_malla["vertex_positions"] = tipo_puntos(puntos.astype(np.float32).ravel())
+    parametros_malla["faces"] = tipo_caras(celdas.astype(np.uint32).ravel())
+    parametros_malla.update()
+    malla.set_bsdf(mi.load_dict({"type": "diffuse", "reflectance": {"type": "rgb", "value": reflectancia}}))
+
+    escena = mi.load_dict({
+        "type": "scene",
+        "earth": {"type": "sphere", "radius": radio_planeta, "center": [0, 0, -2 * radio_planeta],
+                  "bsdf": {"type": "diffuse", "reflectance": {"type": "rgb", "value": 0.0}}},
+        "panel": malla,
+        "sun": {"type": "point", "position": [0, 0, 0], "intensity": {"type": "rgb", "value": 1.0}},
+    })
+    sensor = mi.load_dict({
+        "type": "perspective",
+        "to_world": mi.ScalarTransform4f().look_at(origin=list(camara), target=[0, 0, 0], up=[0, 1, 0]),
+        "film": {"type": "hdrfilm", "width": resolucion[0], "height": resolucion[1], "pixel_format": "rgb"},
+    })
+    return {
+        "escena": escena,
+        "sensor": sensor,
+        "integrador": mi.load_dict({"type": "path"}),
+        "parametros": mi.traverse(escena),
+        "radio_planeta": radio_planeta,
+        "irradiancia": irradiancia,
+    }
+
+# Colocar la Tierra y el Sol para una pose del satélite (posición (3,) y rotación (3, 3))
+# cambiando solo sus parámetros; Mitsuba reconstruye únicamente lo que ha cambiado. La
+# intensidad del Sol puntual (W/sr) es irradiancia·d² para que en el satélite llegue irradiancia.
+def actualizar_pose(mitsuba, posicion, rotacion, posicion_sol=(-1e9, 0.0, 0.0)):
+    posiciones, rotaciones = np.asarray(posicion)[None], np.asarray(rotacion)[None]
+    tierra = puntos_a_cuerpo(np.zeros((1, 3)), posiciones, rotaciones)[0]
+    sol = puntos_a_cuerpo(np.asarray(posicion_sol, dtype=np.float64)[None], posiciones, rotaciones)[0]
+    parametros = mitsuba["parametros"]
+    parametros["earth.to_world"] = mi.ScalarTransform4f().translate(tierra.tolist()).scale(mitsuba["radio_planeta"])
+    parametros["sun.position"] = mi.ScalarPoint3f(sol.tolist())
+    parametros["sun.intensity.value"] = mi.ScalarColor3f(mitsuba["irradiancia"] * float(sol @ sol))
+    parametros.update()
+
+def renderizar(mitsuba, spp=16, semilla=0):
+    return np.array(mi.render(mitsuba["escena"], integrator=mitsuba["integrador"], sensor=mitsuba["sensor"],
+                              spp=spp, seed=semilla))
+
+# Barrido de render a lo largo de la órbita sobre la misma escena. Devuelve el brillo medio de
+# la imagen en cada paso y, si imagenes=True, también las imágenes (T, alto, ancho, 3).
+def barrido_render(mitsuba, tiempos, actitud=actitud_inercial, posicion_sol=(-1e9, 0.0, 0.0), spp=16,
+                   imagenes=False):
+    posiciones, rotaciones = pose_satelite(tiempos, actitud)
+    brillo, salida = np.zeros(len(posiciones)), []
+    for k in tqdm(range(len(posiciones)), desc="Render de la órbita"):
+        actualizar_pose(mitsuba, posiciones[k], rotaciones[k], posicion_sol)
+        imagen = renderizar(mitsuba, spp, semilla=k)
+        brillo[k] = imagen.mean()
+        if imagenes:
+            salida.append(imagen)
+    return (brillo, np.array(salida)) if imagenes else brillo
+
+if __name__ == "__main__":
+    import time
+
+    import matplotlib.pyplot as plt
+
+    # Panel de test_mitsuba_render.py (n = 10) con el Sol muy lejos en -X y algo por debajo
+    # del plano del panel (con el Sol en su plano, como en el script Legacy, no le llega luz)
+    inicio = time.perf_counter()
+    mitsuba = escena_mitsuba(caras_panel(10))
+    print(f"Escena cargada una vez en {time.perf_counter() - inicio:.3f} s")
+
+    tiempos = np.linspace(0, orbit_time, 60, endpoint=False)
+    inicio = time.perf_counter()
+    brillo, imagenes = barrido_render(mitsuba, tiempos, posicion_sol=(-1e9, 0.0, -1e9), imagenes=True)
+    print(f"{len(tiempos)} pasos renderizados en {time.perf_counter() - inicio:.2f} s")
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+    ax1.plot(tiempos / 60, brillo)
+    ax1.set_xlabel("Tiempo (min)")
+    ax1.set_ylabel("Brillo medio de la imagen")
+    ax1.grid()
+    ax2.imshow(np.clip(imagenes[len(tiempos) // 4], 0, 1))
+    ax2.set_title("Iluminación simulada del satélite")
+    ax2.axis("off")
+    plt.show()
@@ -0,0 +1,71 @@
+import os
+from contextlib import ExitStack, chdir, contextmanager
+
+import meshio
+import numpy as np
+from tqdm import tqdm
+
+from caras import caras_panel, malla_de_caras
+from orbita import iluminacion_orbita, orbit_time
+
+# Serie temporal XDMF + HDF5 con la malla escrita una sola vez. Devuelve una función
+# escribir(t, **arrays) que añade al fichero los arrays por cara de ese instante, así que la
+# memoria no crece con el número de pasos y nunca se reescribe la malla.
+@contextmanager
+def serie_temporal(ruta, caras):
+    puntos, celdas = malla_de_caras(caras)
+    tipo = {3: "triangle", 4: "quad"}[celdas.shape[1]]
+    ruta = os.path.abspath(ruta)
+    with ExitStack() as pila:
+        # meshio abre el .h5 con el nombre del .xdmf en el directorio actual: se abre desde el
+        # directorio de destino para que quede junto al .xdmf, que lo referencia por el nombre
+        with chdir(os.path.dirname(ruta)):
+            escritor = pila.enter_context(meshio.xdmf.TimeSeriesWriter(ruta))
+        escritor.write_points_cells(puntos, [(tipo, celdas)])
+
+        def escribir(t, **arrays):
+            escritor.write_data(float(t), cell_data={nombre: [np.asarray(valor)] for nombre, valor in arrays.items()})
+
+        yield escribir
+
+# Barrido de una órbita guardado en streaming: funcion(tiempos, caras, **kwargs) se evalúa por
+# bloques de tam_bloque tiempos y cada fila (una por instante) se añade a la serie con el nombre
+# dado. Solo hay un bloque en memoria a la vez.
+def guardar_barrido(ruta, funcion, tiempos, caras, nombre="F", tam_bloque=256, **kwargs):
+    tiempos = np.asarray(tiempos, dtype=np.float64)
+    with serie_temporal(ruta, caras) as escribir:
+        for a in tqdm(range(0, len(tiempos), tam_bloque), desc="Escribiendo serie"):
+            bloque = tiempos[a:a + tam_bloque]
+            for t, fila in zip(bloque, funcion(bloque, caras, **kwargs)):
+                escribir(t, **{nombre: fila})
+
+# Leer una serie escrita con serie_temporal: tiempos y, para cada array, una matriz (T x F)
+def leer_serie(ruta):
+    with meshio.xdmf.TimeSeriesReader(ruta) as lector:
+        lector.read_points_cells()
+        tiempos, arrays = [], {}
+        for k in range(lector.num_steps):
+            t, _, cell_data = lector.read_data(k)
+            tiempos.append(t)
+            for nombre, valores in cell_data.items():
+                arrays.setdefault(nombre, []).append(valores[0])
+    return np.array(tiempos), {nombre: np.array(filas) for nombre, filas in arrays.items()}
+
+if __name__ == "__main__":
+    import tempfile
+
+    # Coseno de incidencia de cada cara del panel durante una órbita, paso a paso en XDMF + HDF5
+    # (en un directorio temporal; guardar_barrido acepta cualquier ruta)
+    panel = caras_panel(50)
+    tiempos = np.arange(0, orbit_time, 10.0)
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "iluminacion_panel.xdmf")
+        guardar_barrido(ruta, iluminacion_orbita, tiempos, panel, nombre="coseno",
+                        direccion_sol=(1.0, 0.0, -1.0), coseno=True, progreso=False)
+
+        crudo = len(tiempos) * len(panel["areas"]) * 8
+        tam = os.path.getsize(ruta) + os.path.getsize(os.path.join(directorio, "iluminacion_panel.h5"))
+        print(f"{len(tiempos)} pasos: {tam / 1e6:.1f} MB en disco para {crudo / 1e6:.1f} MB de datos")
+
+        leidos, arrays = leer_serie(ruta)
+        print("Serie leída:", arrays["coseno"].shape)
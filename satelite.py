@@ -0,0 +1,176 @@
+import numpy as np
+from tqdm import tqdm
+
+from bvh import rayos_ocluidos
+from escena import crear_escena
+from orbita import angular_velocity, earth_radius, orbit_time, posiciones_satelite, satellite_orbit_radius
+from sombra import en_sombra_local
+
+# La geometría del satélite (escena con su BVH) se guarda siempre en el marco del cuerpo y no
+# se mueve nunca. La pose de cada paso de tiempo es una posición p (T, 3) y una rotación R
+# (T, 3, 3) cuyas columnas son los ejes del cuerpo en el marco inercial: x_inercial = p + R·x_cuerpo.
+# Para lanzar rayos se llevan los rayos al marco del cuerpo, no la malla al inercial.
+
+# Actitud fija en el espacio (lo que hacen los scripts Legacy): R = identidad en todos los pasos
+def actitud_inercial(tiempos, velocidad=angular_velocity):
+    return np.broadcast_to(np.eye(3), (len(np.atleast_1d(tiempos)), 3, 3))
+
+# Actitud apuntando al nadir en la órbita del plano XY: x del cuerpo en la dirección de avance,
+# z del cuerpo hacia el centro de la Tierra e y = z × x
+def actitud_nadir(tiempos, velocidad=angular_velocity):
+    theta = velocidad * np.atleast_1d(np.asarray(tiempos, dtype=np.float64))
+    cero = np.zeros_like(theta)
+    x = np.stack([-np.sin(theta), np.cos(theta), cero], axis=-1)
+    z = np.stack([-np.cos(theta), -np.sin(theta), cero], axis=-1)
+    return np.stack([x, np.cross(z, x), z], axis=-1)
+
+# Posición y actitud del satélite en cada paso de tiempo
+def pose_satelite(tiempos, actitud=actitud_inercial, radio=satellite_orbit_radius, velocidad=angular_velocity):
+    tiempos = np.atleast_1d(np.asarray(tiempos, dtype=np.float64))
+    return posiciones_satelite(tiempos, radio, velocidad), actitud(tiempos, velocidad)
+
+# Puntos inerciales (T, ..., 3) al marco del cuerpo: x_cuerpo = Rᵀ·(x − p)
+def puntos_a_cuerpo(puntos, posiciones, rotaciones):
+    puntos = np.asarray(puntos, dtype=np.float64)
+    extra = (None,) * (puntos.ndim - 2)
+    relativos = puntos - posiciones[(slice(None),) + extra]
+    return np.einsum("tij,t...i->t...j", rotaciones, relativos)
+
+# Direcciones inerciales (T, ..., 3) o una sola (3,) para todos los pasos al marco del cuerpo
+def direcciones_a_cuerpo(direcciones, rotaciones):
+    direcciones = np.asarray(direcciones, dtype=np.float64)
+    if direcciones.ndim == 1:
+        return np.einsum("tij,i->tj", rotaciones, direcciones)
+    return np.einsum("tij,t...i->t...j", rotaciones, direcciones)
+
+# Dirección del Sol (en el infinito) vista desde el cuerpo en cada paso (T, 3)
+def sol_en_cuerpo(rotaciones, direccion_sol=(1.0, 0.0, 0.0)):
+    s = np.asarray(direccion_sol, dtype=np.float64)
+    return direcciones_a_cuerpo(s / np.linalg.norm(s), rotaciones)
+
+# Centro de la Tierra (origen inercial) en el marco del cuerpo en cada paso (T, 3)
+def tierra_en_cuerpo(posiciones, rotaciones):
+    return puntos_a_cuerpo(np.zeros_like(posiciones), posiciones, rotaciones)
+
+# Rayos dados en el marco inercial, uno o varios por paso (T, K, 3), lanzados contra la BVH del
+# satélite construida una sola vez. Como la BVH no cambia, los rayos de todos los pasos se
+# llevan al marco del cuerpo y se lanzan en un único lote. Devuelve la máscara (T, K).
+def rayos_satelite(escena, posiciones, rotaciones, origenes, direcciones, t_max=np.inf, ignorar=None,
+                   **kwargs):
+    o = puntos_a_cuerpo(origenes, posiciones, rotaciones)
+    d = direcciones_a_cuerpo(direcciones, rotaciones)
+    d = np.broadcast_to(d if d.ndim == 3 else d[:, None, :], o.shape)
+    t_max = np.broadcast_to(np.asarray(t_max, dtype=np.float64), o.shape[:2]).reshape(-1)
+    if ignorar is not None:
+        ignorar = np.broadcast_to(np.asarray(ignorar), o.shape[:2] + np.shape(ignorar)[2:])
+        ignorar = ignorar.reshape(o.shape[0] * o.shape[1], -1)
+    ocluido = rayos_ocluidos(escena["bvh"], o.reshape(-1, 3), d.reshape(-1, 3), t_max=t_max,
+                             ignorar=ignorar, **kwargs)
+    return ocluido.reshape(o.shape[:2])
+
+# Rayos desde cada cara del satélite (ya en el marco del cuerpo) en las direcciones de cada paso
+# (T, 3). Devuelve la máscara (T, F) de caras cuyo rayo choca con el propio satélite.
+def rayos_caras_cuerpo(escena, direcciones, eps=1e-6, **kwargs):
+    caras = escena["caras"]
+    direcciones = np.asarray(direcciones, dtype=np.float64)
+    n_pasos, n_caras = len(direcciones), len(caras["areas"])
+    origenes = caras["centroides"] + eps * caras["normales"]
+    o = np.broadcast_to(origenes, (n_pasos, n_caras, 3)).reshape(-1, 3)
+    d = np.broadcast_to(direcciones[:, None, :], (n_pasos, n_caras, 3)).reshape(-1, 3)
+    propia = np.broadcast_to(np.arange(n_caras), (n_pasos, n_caras)).reshape(-1)
+    return rayos_ocluidos(escena["bvh"], o, d, ignorar=propia, **kwargs).reshape(n_pasos, n_caras)
+
+# Coordenadas baricéntricas (K, 3) de los centroides de los m² subtriángulos de igual área en
+# que se divide cada triángulo al partir sus lados en m trozos
+def _pesos_muestra(m):
+    i, j = np.meshgrid(np.arange(m), np.arange(m), indexing="ij")
+    arriba = i + j <= m - 1
+    abajo = i + j <= m - 2
+    u = np.concatenate([i[arriba] + 1 / 3, i[abajo] + 2 / 3]) / m
+    v = np.concatenate([j[arriba] + 1 / 3, j[abajo] + 2 / 3]) / m
+    return np.stack([1 - u - v, u, v], axis=1)
+
+# Fracción iluminada de cada cara del satélite a lo largo de la órbita (T x F), con la sombra
+# de la Tierra (cilíndrica, Sol en el infinito) y la que se hacen entre sí las partes del
+# satélite. Cada cara se muestrea con muestras_lado² puntos; solo se lanzan rayos contra la
+# BVH del cuerpo desde los puntos de caras que miran al Sol y no están en eclipse, y todos los
+# de un bloque de pasos de tiempo van en un único lote (tam_bloque limita puntos por bloque).
+# Con coseno=True la fracción se multiplica por el coseno de incidencia max(n·s, 0).
+def iluminacion_satelite(tiempos, escena, direccion_sol=(1.0, 0.0, 0.0), actitud=actitud_inercial,
+                         muestras_lado=1, coseno=False, sombra_propia=True, radio_planeta=earth_radius,
+                         tam_bloque=1_000_000, eps=1e-6, progreso=True):
+    tiempos = np.atleast_1d(np.asarray(tiempos, dtype=np.float64))
+    caras = escena["caras"]
+    normales = caras["normales"]
+    puntos = np.einsum("kv,fvc->fkc", _pesos_muestra(muestras_lado), caras["triangulos"])
+    origenes = puntos + eps * normales[:, None, :]
+    n_caras, n_muestras = puntos.shape[:2]
+    salida = np.zeros((len(tiempos), n_caras))
+    paso = max(1, tam_bloque // (n_caras * n_muestras))
+
+    for a in tqdm(range(0, len(tiempos), paso), desc="Bloques de tiempo", disable=not progreso):
+        posiciones, rotaciones = pose_satelite(tiempos[a:a + paso], actitud)
+        s = sol_en_cuerpo(rotaciones, direccion_sol)
+        tierra = tierra_en_cuerpo(posiciones, rotaciones)
+        cos = (normales @ s.T.astype(normales.dtype)).T
+
+        luz = np.repeat((cos > 0)[:, :, None], n_muestras, axis=2)
+        luz &= ~en_sombra_local(puntos.reshape(-1, 3), -tierra, s, radio_planeta).reshape(luz.shape)
+        if sombra_propia and luz.any():
+            t, f, k = np.nonzero(luz)
+            luz[t, f, k] = ~rayos_ocluidos(escena["bvh"], origenes[f, k], s[t], ignorar=f)
+
+        fraccion = luz.mean(axis=2)
+        salida[a:a + paso] = fraccion * np.maximum(cos, 0.0) if coseno else fraccion
+    return salida
+
+# Área iluminada total del satélite en cada instante, con sombras propias
+def area_iluminada_satelite(tiempos, escena, **kwargs):
+    return iluminacion_satelite(tiempos, escena, **kwargs) @ escena["caras"]["areas"]
+
+if __name__ == "__main__":
+    import time
+
+    import matplotlib.pyplot as plt
+    import pyvista as pv
+
+    # Satélite del notebook (esfera más plancha) en su marco del cuerpo, en metros.
+    # La BVH se construye una sola vez para toda la órbita.
+    inicio = time.perf_counter()
+    escena = crear_escena({
+        "esfera": pv.Sphere(radius=1, center=(-1.5, 0, 0), theta_resolution=20, phi_resolution=20),
+        "plancha": pv.Plane(center=(0, 0, 0), direction=(-1, 0, 0), i_size=2, j_size=2,
+                            i_resolution=20, j_resolution=20),
+    })
+    print(f"Escena de {len(escena['caras']['areas'])} caras y BVH en {time.perf_counter() - inicio:.3f} s")
+
+    # Órbita apuntando al nadir: el Sol gira en el marco del cuerpo y la malla queda quieta
+    tiempos = np.linspace(0, orbit_time, 360, endpoint=False)
+    posiciones, rotaciones = pose_satelite(tiempos, actitud_nadir)
+    s = sol_en_cuerpo(rotaciones)
+    inicio = time.perf_counter()
+    tapadas = rayos_caras_cuerpo(escena, s)
+    print(f"{tapadas.size} rayos cara -> Sol en {time.perf_counter() - inicio:.2f} s")
+    print("Fracción media de caras tapadas por el propio satélite:", round(tapadas.mean(), 3))
+
+    # Los mismos rayos dados en el marco inercial dan el mismo resultado
+    caras = escena["caras"]
+    origenes = posiciones[:, None, :] + np.einsum("tij,fj->tfi", rotaciones,
+                                                  caras["centroides"] + 1e-6 * caras["normales"])
+    inerciales = rayos_satelite(escena, posiciones, rotaciones, origenes, (1.0, 0.0, 0.0),
+                                ignorar=np.arange(len(caras["areas"]))[None, :, None])
+    print("Coinciden con los rayos inerciales:", bool((inerciales == tapadas).all()))
+
+    # Área iluminada a lo largo de la órbita con y sin las sombras que se hacen las dos partes
+    tiempos = np.arange(0, orbit_time, 10.0)
+    con_sombra = area_iluminada_satelite(tiempos, escena, actitud=actitud_nadir, muestras_lado=2, coseno=True)
+    sin_sombra = area_iluminada_satelite(tiempos, escena, actitud=actitud_nadir, muestras_lado=2, coseno=True,
+                                         sombra_propia=False)
+    plt.figure(figsize=(10, 6))
+    plt.plot(tiempos / 60, sin_sombra, label="Solo eclipse de la Tierra")
+    plt.plot(tiempos / 60, con_sombra, label="Con sombras propias")
+    plt.xlabel("Tiempo (min)")
+    plt.ylabel("Área iluminada proyectada (m²)")
+    plt.grid()
+    plt.legend()
+    plt.show()
@@ -0,0 +1,90 @@
+import time
+
+import numpy as np
+
+# Intersección analítica de rayos origen + t·direccion con una esfera, sin teselarla.
+# origenes es (..., 3) y direccion puede ser una sola (3,) o una por rayo (..., 3).
+# Devuelve la primera t > t_min de cada rayo, o np.inf si no llega a la esfera.
+def interseccion_esfera(origenes, direccion, centro, radio, t_min=0.0):
+    oc = np.asarray(origenes, dtype=np.float64) - np.asarray(centro, dtype=np.float64)
+    d = np.asarray(direccion, dtype=np.float64)
+    a = np.einsum("...k,...k->...", d, d)
+    b = np.einsum("...k,...k->...", oc, d)  # La mitad del término lineal
+    c = np.einsum("...k,...k->...", oc, oc) - radio**2
+    disc = b * b - a * c
+
+    raiz = np.sqrt(np.maximum(disc, 0.0))
+    t1 = (-b - raiz) / a
+    t2 = (-b + raiz) / a
+    t = np.where(t1 > t_min, t1, np.where(t2 > t_min, t2, np.inf))
+    return np.where(disc >= 0, t, np.inf)
+
+# Máscara de rayos que chocan con la esfera por delante del origen (como ray_intersects_sphere)
+def rayos_bloqueados_esfera(origenes, direccion, centro, radio, t_min=0.0):
+    return np.isfinite(interseccion_esfera(origenes, direccion, centro, radio, t_min))
+
+# Camino rápido con el Sol en el infinito: la sombra de la esfera es un cilindro de radio
+# igual al de la esfera a lo largo de -direccion_sol. Un punto está a oscuras si queda
+# detrás del centro respecto al Sol y a menos de un radio del eje del cilindro.
+def en_sombra_cilindrica(puntos, direccion_sol, centro, radio):
+    s = np.asarray(direccion_sol, dtype=np.float64)
+    s = s / np.linalg.norm(s, axis=-1, keepdims=True)
+    p = np.asarray(puntos, dtype=np.float64) - np.asarray(centro, dtype=np.float64)
+    proyeccion = np.einsum("...k,...k->...", p, s)
+    distancia_eje2 = np.einsum("...k,...k->...", p, p) - proyeccion**2
+    return (proyeccion < 0) & (distancia_eje2 < radio**2)
+
+# La misma umbra cilíndrica en coordenadas locales del satélite: locales (F, 3) son las
+# posiciones de las caras respecto al satélite (de orden métrico, pueden ser float32) y
+# desplazamientos (T, 3) la posición del satélite respecto al centro de la esfera en cada paso.
+# Los términos grandes (≈ 6.7e6 m) se calculan una vez por paso en float64 y por cara solo se
+# hacen productos con las coordenadas locales, así que no se suman nunca metros a millones de
+# metros en la precisión de las caras. direccion_sol es (3,) o una por paso (T, 3).
+# Devuelve la máscara (T, F) de caras a oscuras.
+def en_sombra_local(locales, desplazamientos, direccion_sol, radio):
+    locales = np.asarray(locales)
+    d = np.atleast_2d(np.asarray(desplazamientos, dtype=np.float64))
+    s = np.broadcast_to(np.asarray(direccion_sol, dtype=np.float64), d.shape)
+    s = s / np.linalg.norm(s, axis=1, keepdims=True)
+
+    # Por paso: proyección sobre el eje de la sombra y parte perpendicular a del satélite
+    proyeccion = np.einsum("tk,tk->t", d, s)
+    a = d - proyeccion[:, None] * s
+    norma_a = np.linalg.norm(a, axis=1)
+    a_u = a / np.where(norma_a > 0, norma_a, 1.0)[:, None]
+
+    # Por cara: c·s, c·â y |c⊥|², en la precisión de las coordenadas locales
+    tipo = locales.dtype if np.issubdtype(locales.dtype, np.floating) else np.float64
+    cs = (locales @ s.T.astype(tipo)).T
+    ca = (locales @ a_u.T.astype(tipo)).T
+    c_perp2 = np.einsum("fk,fk->f", locales, locales)[None, :] - cs**2
+
+    # |a + c⊥| − |a| = (2|a|·(c·â) + |c⊥|²) / (|a + c⊥| + |a|), con el denominador aproximado
+    # por 2|a| + c·â (error del orden de |c|³/|a|²)
+    n = norma_a[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exceso = np.where(n > 0, (2 * n * ca + c_perp2) / (2 * n + ca), np.sqrt(np.maximum(c_perp2, 0)))
+    return (cs < -proyeccion[:, None]) & (exceso < (radio - norma_a)[:, None])
+
+if __name__ == "__main__":
+    # Misma situación que Legacy/test2.py: Tierra en el origen y Sol en +X
+    earth_radius = 6371e3  # Radio de la Tierra en m
+    satellite_orbit_radius = earth_radius + 300e3
+    light_direction = np.array([1.0, 0.0, 0.0])
+
+    # Un millón de puntos repartidos por la órbita
+    n = 1_000_000
+    theta = np.random.default_rng(0).uniform(0, 2 * np.pi, n)
+    puntos = satellite_orbit_radius * np.stack([np.cos(theta), np.sin(theta), np.zeros(n)], axis=1)
+
+    inicio = time.perf_counter()
+    oscuro_rayos = rayos_bloqueados_esfera(puntos, light_direction, [0, 0, 0], earth_radius)
+    t_rayos = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    oscuro_cilindro = en_sombra_cilindrica(puntos, light_direction, [0, 0, 0], earth_radius)
+    t_cilindro = time.perf_counter() - inicio
+
+    print(f"Intersección rayo-esfera: {n / t_rayos:.3g} puntos/s, fracción en sombra {oscuro_rayos.mean():.4f}")
+    print(f"Umbra cilíndrica: {n / t_cilindro:.3g} puntos/s, fracción en sombra {oscuro_cilindro.mean():.4f}")
+    print("Fracción analítica:", round(np.arcsin(earth_radius / satellite_orbit_radius) / np.pi, 4))
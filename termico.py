@@ -0,0 +1,152 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from tqdm import tqdm
+
+from caras import malla_de_caras
+from planeta import factor_vista_planeta_caras
+from radiosidad import resolver_radiosidad, sigma, sistema_radiosidad
+from satelite import (actitud_inercial, iluminacion_satelite, pose_satelite, sol_en_cuerpo,
+                      tierra_en_cuerpo)
+
+# Entorno térmico en órbita baja
+constante_solar = 1361.0  # Irradiancia solar (W/m²)
+albedo_tierra = 0.3  # Fracción de la luz solar que refleja la Tierra
+temperatura_tierra = 255.0  # Temperatura de cuerpo negro equivalente de la Tierra (K)
+
+# Matriz de conducción (N x N, laplaciana) entre caras que comparten una arista:
+# G = k·e·L / d, con L la longitud de la arista y d la distancia entre centroides
+def conduccion_malla(caras, conductividad, espesor):
+    puntos, celdas = malla_de_caras(caras)
+    n = len(celdas)
+    aristas = np.sort(np.stack([celdas, np.roll(celdas, -1, axis=1)], axis=2).reshape(-1, 2), axis=1)
+    cara = np.repeat(np.arange(n), celdas.shape[1])
+    _, grupo = np.unique(aristas, axis=0, return_inverse=True)
+    orden = np.argsort(grupo, kind="stable")
+    grupo, cara, aristas = grupo[orden], cara[orden], aristas[orden]
+
+    # Aristas compartidas: dos entradas seguidas del mismo grupo
+    compartida = np.flatnonzero(grupo[1:] == grupo[:-1])
+    i, j = cara[compartida], cara[compartida + 1]
+    L = np.linalg.norm(puntos[aristas[compartida, 0]] - puntos[aristas[compartida, 1]], axis=1)
+    d = np.linalg.norm(caras["centroides"][i] - caras["centroides"][j], axis=1)
+    G = np.broadcast_to(np.asarray(conductividad * espesor, dtype=np.float64), (n,))
+    G = 0.5 * (G[i] + G[j]) * L / d
+
+    K = sp.coo_matrix((np.r_[-G, -G], (np.r_[i, j], np.r_[j, i])), shape=(n, n)).tocsr()
+    return K - sp.diags(np.asarray(K.sum(axis=1)).ravel())
+
+# Modelo térmico de una escena (crear_escena) con una placa delgada por cara. Lo que no cambia
+# a lo largo de la órbita se monta aquí una sola vez: capacidades térmicas, conducción y el
+# sistema de intercambio radiativo interno (F_interna dispersa de i a j; sin ella cada cara
+# solo radia al espacio y a la Tierra). Las propiedades son escalares o arrays por cara.
+def modelo_termico(escena, espesor=2e-3, densidad=2700.0, calor_especifico=900.0, conductividad=167.0,
+                   emisividad=0.85, absortividad=0.3, F_interna=None, metodo="gauss_seidel"):
+    caras = escena["caras"]
+    n = len(caras["areas"])
+    if F_interna is None:
+        F_interna = sp.csr_matrix((n, n))
+    return {
+        "escena": escena,
+        "capacidad": densidad * calor_especifico * espesor * caras["areas"],
+        "conduccion": conduccion_malla(caras, conductividad, espesor),
+        "absortividad": np.broadcast_to(np.asarray(absortividad, dtype=np.float64), (n,)),
+        "radiacion": sistema_radiosidad(F_interna, caras["areas"], emisividad, metodo),
+        "factorizaciones": {},
+    }
+
+# (C/Δt + K) factorizada una sola vez por cada paso de tiempo distinto
+def _factorizacion(modelo, dt):
+    clave = round(float(dt), 9)
+    if clave not in modelo["factorizaciones"]:
+        A = sp.diags(modelo["capacidad"] / dt) + modelo["conduccion"]
+        modelo["factorizaciones"][clave] = splu(A.tocsc())
+    return modelo["factorizaciones"][clave]
+
+# Cargas del entorno (T x F) para un bloque de tiempos: potencia solar y de albedo absorbida
+# por cada cara (W) e irradiancia infrarroja de la Tierra sobre cada cara (W/m²)
+def cargas_entorno(modelo, tiempos, direccion_sol=(1.0, 0.0, 0.0), actitud=actitud_inercial,
+                   sombra_propia=True):
+    escena = modelo["escena"]
+    caras = escena["caras"]
+    posiciones, rotaciones = pose_satelite(tiempos, actitud)
+    s = sol_en_cuerpo(rotaciones, direccion_sol)
+    tierra = tierra_en_cuerpo(posiciones, rotaciones)
+
+    iluminacion = iluminacion_satelite(tiempos, escena, direccion_sol, actitud, coseno=True,
+                                       sombra_propia=sombra_propia, progreso=False)
+    F_tierra = factor_vista_planeta_caras(caras["normales"], tierra)
+    # Albedo con el coseno del ángulo solar en el punto subsatélite
+    cos_subsatelite = np.maximum(-np.einsum("tk,tk->t", tierra / np.linalg.norm(tierra, axis=1, keepdims=True), s), 0)
+
+    absorbido = modelo["absortividad"] * caras["areas"] * constante_solar * (
+        iluminacion + albedo_tierra * F_tierra * cos_subsatelite[:, None])
+    infrarrojo = F_tierra * sigma * temperatura_tierra**4
+    return absorbido, infrarrojo
+
+# Simulación térmica transitoria a lo largo de los tiempos dados (s), con Euler implícito en
+# la conducción (matriz factorizada una vez) y la radiación y el entorno explícitos en cada
+# paso. Por paso solo se actualizan las cargas del entorno y se resuelve el intercambio
+# radiativo arrancando desde la radiosidad anterior. Devuelve las temperaturas (T x F) en K.
+def simular_orbita(modelo, tiempos, temperatura_inicial=293.15, direccion_sol=(1.0, 0.0, 0.0),
+                   actitud=actitud_inercial, potencia_interna=0.0, sombra_propia=True, tam_bloque=256):
+    tiempos = np.asarray(tiempos, dtype=np.float64)
+    areas = modelo["escena"]["caras"]["areas"]
+    C = modelo["capacidad"]
+    T = np.broadcast_to(np.asarray(temperatura_inicial, dtype=np.float64), areas.shape).copy()
+    salida = np.zeros((len(tiempos), len(areas)))
+    salida[0] = T
+    J = None
+
+    for a in tqdm(range(0, len(tiempos) - 1, tam_bloque), desc="Bloques de tiempo"):
+        bloque = tiempos[a:min(a + tam_bloque, len(tiempos) - 1)]
+        absorbido, infrarrojo = cargas_entorno(modelo, bloque, direccion_sol, actitud, sombra_propia)
+        for k, t in enumerate(bloque):
+            dt = tiempos[a + k + 1] - t
+            J, q, _ = resolver_radiosidad(modelo["radiacion"], T, infrarrojo[k], J0=J, tolerancia=1e-8)
+            Q = absorbido[k] - q * areas + potencia_interna
+            T = _factorizacion(modelo, dt).solve(C / dt * T + Q)
+            salida[a + k + 1] = T
+    return salida
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    import matplotlib.pyplot as plt
+    import pyvista as pv
+
+    from disperso import construir_matriz_dispersa
+    from escena import crear_escena
+    from orbita import orbit_time
+    from satelite import actitud_nadir
+
+    # Satélite del notebook (esfera más plancha) apuntando al nadir, paso de 1 s como los
+    # scripts Legacy
+    escena = crear_escena({
+        "esfera": pv.Sphere(radius=1, center=(-1.5, 0, 0), theta_resolution=12, phi_resolution=12),
+        "plancha": pv.Plane(center=(0, 0, 0), direction=(-1, 0, 0), i_size=2, j_size=2,
+                            i_resolution=8, j_resolution=8),
+    })
+    with tempfile.TemporaryDirectory() as directorio:
+        # Copia en memoria para poder borrar el directorio temporal
+        F = construir_matriz_dispersa(escena["caras"], directorio, bvh=escena["bvh"]).copy()
+    modelo = modelo_termico(escena, F_interna=F)
+
+    tiempos = np.arange(0, 3 * orbit_time, 1.0)
+    inicio = time.perf_counter()
+    T = simular_orbita(modelo, tiempos, actitud=actitud_nadir, direccion_sol=(1.0, 0.3, 0.0))
+    duracion = time.perf_counter() - inicio
+    print(f"{len(tiempos)} pasos en {duracion:.1f} s ({1e3 * duracion / len(tiempos):.2f} ms por paso)")
+
+    superficie = escena["caras"]["superficie"]
+    areas = escena["caras"]["areas"]
+    plt.figure(figsize=(10, 6))
+    for s, nombre in enumerate(escena["nombres"]):
+        media = T[:, superficie == s] @ areas[superficie == s] / areas[superficie == s].sum()
+        plt.plot(tiempos / 60, media - 273.15, label=nombre)
+    plt.xlabel("Tiempo (min)")
+    plt.ylabel("Temperatura media (ºC)")
+    plt.grid()
+    plt.legend()
+    plt.show()
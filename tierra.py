@@ -0,0 +1,140 @@
+import numpy as np
+
+from bvh import rayos_ocluidos
+from caras import base_tangente, propiedades_triangulos
+from orbita import earth_radius, satellite_orbit_radius
+from satelite import actitud_inercial, pose_satelite
+
+# Casquete de la Tierra visible desde el satélite (posición (3,) con la Tierra en el origen),
+# en lugar de una esfera completa de resolución uniforme. Los anillos se reparten en el
+# ángulo η con el que el satélite ve cada punto respecto al nadir (de 0 al horizonte,
+# sen η_max = R/r) como η = η_max·sen(π/2·k/n_anillos): casi uniformes junto al punto
+# subsatélite y más juntos hacia el horizonte, donde las celdas se estiran y las caras
+# facetadas más se separan de la esfera. Cada anillo tiene n_azimut divisiones. Con los
+# valores por defecto el factor de vista de una placa queda a menos del 0.11 % de la forma
+# cerrada para cualquier orientación.
+# Con relativo=True las coordenadas se dan respecto al satélite.
+def casquete_tierra(posicion, radio=earth_radius, n_anillos=32, n_azimut=64, relativo=False):
+    posicion = np.asarray(posicion, dtype=np.float64)
+    distancia = np.linalg.norm(posicion)
+    z = posicion / distancia
+    t1, t2 = base_tangente(z[None])
+
+    # Ángulo central φ de cada anillo a partir del ángulo de visión η desde el satélite
+    eta = np.arcsin(radio / distancia) * np.sin(0.5 * np.pi * np.arange(n_anillos + 1) / n_anillos)
+    phi = np.arcsin(np.clip(distancia / radio * np.sin(eta), -1, 1)) - eta
+    alfa = 2 * np.pi * np.arange(n_azimut) / n_azimut
+    anillos = radio * (np.sin(phi)[:, None, None] * (np.cos(alfa)[None, :, None] * t1 + np.sin(alfa)[None, :, None] * t2)
+                       + np.cos(phi)[:, None, None] * z)
+    if relativo:
+        anillos = anillos - posicion
+
+    # Abanico alrededor del punto subsatélite y dos triángulos por celda entre anillos
+    siguiente = np.roll(np.arange(n_azimut), -1)
+    abanico = np.stack([np.broadcast_to(anillos[0, 0], (n_azimut, 3)), anillos[1], anillos[1, siguiente]], axis=1)
+    a, b = anillos[1:-1], anillos[2:]
+    a2, b2 = a[:, siguiente], b[:, siguiente]
+    celdas = np.concatenate([np.stack([a, b, b2], axis=2), np.stack([a, b2, a2], axis=2)]).reshape(-1, 3, 3)
+    triangulos = np.concatenate([abanico, celdas])
+
+    # Normales hacia fuera de la Tierra
+    normales, _, centroides = propiedades_triangulos(triangulos)
+    centro = -posicion if relativo else np.zeros(3)
+    dentro = np.einsum("fk,fk->f", normales, centroides - centro) < 0
+    triangulos[dentro] = triangulos[dentro][:, [0, 2, 1]]
+    normales, areas, centroides = propiedades_triangulos(triangulos)
+    return {
+        "triangulos": np.ascontiguousarray(triangulos),
+        "normales": normales,
+        "areas": areas,
+        "centroides": centroides,
+    }
+
+# Casquete de cada paso para un array de posiciones del satélite (T, 3), en coordenadas
+# relativas al satélite y, si se dan rotaciones (T, 3, 3), en el marco del cuerpo
+def casquetes_orbita(posiciones, rotaciones=None, **kwargs):
+    for k, posicion in enumerate(np.asarray(posiciones, dtype=np.float64)):
+        casquete = casquete_tierra(posicion, relativo=True, **kwargs)
+        if rotaciones is not None:
+            # x_cuerpo = Rᵀ·x, con los puntos como filas
+            casquete = {clave: valor @ rotaciones[k] if clave != "areas" else valor
+                        for clave, valor in casquete.items()}
+        yield casquete
+
+# Factor de vista de cada cara de una escena del satélite (crear_escena, en el marco del cuerpo)
+# a la Tierra a lo largo de la órbita (T x F), integrando sobre el casquete de cada paso con el
+# núcleo cos·cos/(πr²) entre el centroide de cada cara y los triángulos del casquete. Con
+# sombra_propia los rayos cara -> casquete que choca con la BVH del satélite no cuentan, algo que
+# la forma cerrada de planeta.py no tiene en cuenta. tam_bloque limita pares cara - triángulo.
+def factor_vista_tierra_casquete(tiempos, escena, actitud=actitud_inercial, sombra_propia=True,
+                                 n_anillos=32, n_azimut=64, tam_bloque=1 << 20):
+    caras = escena["caras"]
+    n_caras = len(caras["areas"])
+    posiciones, rotaciones = pose_satelite(tiempos, actitud)
+    salida = np.zeros((len(posiciones), n_caras))
+
+    for t, casquete in enumerate(casquetes_orbita(posiciones, rotaciones, n_anillos=n_anillos,
+                                                  n_azimut=n_azimut)):
+        paso = max(1, tam_bloque // len(casquete["areas"]))
+        for a in range(0, n_caras, paso):
+            filas = np.arange(a, min(a + paso, n_caras))
+            d = casquete["centroides"][None, :, :] - caras["centroides"][filas, None, :]
+            r2 = np.einsum("fck,fck->fc", d, d)
+            c1 = np.einsum("fk,fck->fc", caras["normales"][filas], d)
+            c2 = -np.einsum("ck,fck->fc", casquete["normales"], d)
+            f, c = np.nonzero((c1 > 0) & (c2 > 0))
+            F = c1[f, c] * c2[f, c] * casquete["areas"][c] / (np.pi * r2[f, c] ** 2)
+            if sombra_propia and len(f):
+                F[rayos_ocluidos(escena["bvh"], caras["centroides"][filas[f]], d[f, c],
+                                 ignorar=filas[f])] = 0.0
+            salida[t, filas] = np.bincount(f, weights=F, minlength=len(filas))
+    return salida
+
+if __name__ == "__main__":
+    import pyvista as pv
+
+    from caras import caras_de_malla
+    from planeta import factor_vista_planeta
+
+    # Factor de vista de una placa a la Tierra con el núcleo cos·cos/(πr²) entre el centro de
+    # la placa y los triángulos de la Tierra, comparado con la forma cerrada
+    def factor_placa(tierra, normal, origen):
+        d = tierra["centroides"] - origen
+        r2 = np.einsum("fk,fk->f", d, d)
+        c1 = np.maximum(d @ normal, 0)
+        c2 = np.maximum(-np.einsum("fk,fk->f", tierra["normales"], d), 0)
+        return np.sum(c1 * c2 * tierra["areas"] / (np.pi * r2**2))
+
+    posicion = np.array([satellite_orbit_radius, 0.0, 0.0])
+    H = satellite_orbit_radius / earth_radius
+    tierra_notebook = caras_de_malla(pv.Sphere(radius=earth_radius, theta_resolution=50, phi_resolution=50))
+    casquete = casquete_tierra(posicion, relativo=True)
+    print(f"Esfera del notebook: {len(tierra_notebook['areas'])} triángulos; casquete: {len(casquete['areas'])}")
+
+    print("gamma (º)   forma cerrada   casquete   esfera 50x50")
+    for gamma in np.radians([0, 45, 80, 100]):
+        normal = np.array([-np.cos(gamma), np.sin(gamma), 0.0])
+        print(f"{np.degrees(gamma):8.0f}   {factor_vista_planeta(H, gamma):13.5f}"
+              f"   {factor_placa(casquete, normal, np.zeros(3)):8.5f}"
+              f"   {factor_placa(tierra_notebook, normal, posicion):12.5f}")
+
+    # Satélite del notebook (esfera más plancha) apuntando al nadir: la plancha tapa parte de
+    # la Tierra a la esfera, algo que la forma cerrada por cara no ve
+    from escena import crear_escena
+    from orbita import orbit_time
+    from planeta import factor_vista_planeta_caras
+    from satelite import actitud_nadir, tierra_en_cuerpo
+
+    escena = crear_escena({
+        "esfera": pv.Sphere(radius=1, center=(0, 0, -1.5), theta_resolution=12, phi_resolution=12),
+        "plancha": pv.Plane(center=(0, 0, 0), direction=(0, 0, -1), i_size=2, j_size=2),
+    })
+    tiempos = np.linspace(0, orbit_time, 4, endpoint=False)
+    areas = escena["caras"]["areas"]
+    esfera = escena["caras"]["superficie"] == 0
+    posiciones, rotaciones = pose_satelite(tiempos, actitud_nadir)
+    forma_cerrada = factor_vista_planeta_caras(escena["caras"]["normales"], tierra_en_cuerpo(posiciones, rotaciones))
+    sin_sombra = factor_vista_tierra_casquete(tiempos, escena, actitud_nadir, sombra_propia=False)
+    con_sombra = factor_vista_tierra_casquete(tiempos, escena, actitud_nadir)
+    for nombre, F in (("Forma cerrada", forma_cerrada), ("Casquete", sin_sombra), ("Casquete con sombras", con_sombra)):
+        print(f"{nombre:22s} F esfera -> Tierra = {(F[:, esfera] @ areas[esfera] / areas[esfera].sum()).mean():.4f}")